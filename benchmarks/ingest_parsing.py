@@ -0,0 +1,124 @@
+"""
+Compare the per-row parse cost of CSV chunks and Parquet record batches.
+
+The CSV path parses rows with csv.reader, builds an Organization per row and hashes it for
+change detection. The Parquet path reads record batches from the file, encodes them for the broker
+and decodes them like the worker, then validates and converts whole columns with pyarrow. Its rows
+are hashed by Postgres while they are upserted. Reference data lookups go to Redis and Postgres
+alike for both paths and are left out, so no service is needed:
+
+    python benchmarks/ingest_parsing.py --rows 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+import pyarrow as pa  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+from django.core.files import File  # noqa: E402
+
+from organizations.tasks import (  # noqa: E402
+    PARQUET_COLUMNS,
+    CacheManager,
+    ChunkProcessor,
+    FileProcessor,
+    get_content_hash,
+)
+
+COUNTRIES = ["United States", "Spain", "Germany", "Japan", "Brazil"]
+INDUSTRIES = ["Software", "Biotech", "Manufacturing", "Retail"]
+
+
+def get_many_ids(model, field, values):
+    return {value: i for i, value in enumerate(sorted(values))}
+
+
+def get_rows(count):
+    return [
+        [
+            str(i),
+            f"org{i}",
+            f"Organization {i}",
+            f"https://organization{i}.com",
+            COUNTRIES[i % len(COUNTRIES)],
+            "Organization description",
+            str(1900 + i % 100),
+            INDUSTRIES[i % len(INDUSTRIES)],
+            str(i * 10),
+        ]
+        for i in range(count)
+    ]
+
+
+def get_csv_chunks(rows, chunk_size):
+    lines = [",".join(row) + "\n" for row in rows]
+    return [lines[i : i + chunk_size] for i in range(0, len(lines), chunk_size)]
+
+
+def get_parquet_file(rows, path):
+    columns = {name: [row[i + 1] for row in rows] for i, name in enumerate(PARQUET_COLUMNS)}
+    columns["Founded"] = [int(value) for value in columns["Founded"]]
+    columns["Number of employees"] = [int(value) for value in columns["Number of employees"]]
+    pq.write_table(pa.table(columns), path)
+    return File(open(path, "rb"), name=path)
+
+
+def parse_csv(chunks):
+    for chunk in chunks:
+        rows, _ = ChunkProcessor.parse_rows(chunk)
+        organizations = ChunkProcessor.get_organizations_from_rows(rows)
+        [get_content_hash(org) for org in organizations]
+
+
+def parse_parquet(parquet_file):
+    # Ranged reads close the file, like a stored file it's opened again for each run
+    for batch, _ in FileProcessor(parquet_file.open("rb")).get_record_batches():
+        ChunkProcessor.parse_table(FileProcessor.decode_record_batch(batch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per CSV chunk.")
+    parser.add_argument("--number", type=int, default=3, help="Runs per path.")
+    parser.add_argument(
+        "--no-hash", action="store_true", help="Leave the change detection hashes out."
+    )
+    args = parser.parse_args()
+
+    CacheManager.get_many_ids = staticmethod(get_many_ids)
+    if args.no_hash:
+        globals()["get_content_hash"] = lambda org: None
+
+    rows = get_rows(args.rows)
+    chunks = get_csv_chunks(rows, args.chunk_size)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        parquet_file = get_parquet_file(rows, os.path.join(directory, "organizations.parquet"))
+        for name, run in [
+            ("csv", lambda: parse_csv(chunks)),
+            ("parquet", lambda: parse_parquet(parquet_file)),
+        ]:
+            elapsed = min(timeit.repeat(run, number=1, repeat=args.number))
+            results[name] = elapsed / args.rows * 1_000_000
+            print(f"{name:>8}: {results[name]:.2f} µs per row")
+        parquet_file.close()
+
+    print(f" speedup: {results['csv'] / results['parquet']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measure requests/sec and latency of an endpoint under a fixed number of concurrent clients.
+
+Compare the WSGI and ASGI deployments by running the same load against both:
+
+    make wsgi   # gunicorn on :8000
+    make asgi   # uvicorn on :8001
+    python benchmarks/search_throughput.py http://localhost:8000/organizations/search/?q=tech
+    python benchmarks/search_throughput.py http://localhost:8001/organizations/async/search/?q=tech
+
+Send Cache-Control: no-cache (the default) so every request reaches Elasticsearch.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+
+async def fetch(session, url, headers):
+    async with session.get(url, headers=headers) as response:
+        await response.read()
+        return response.status
+
+
+async def run_client(session, url, headers, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started_at = time.monotonic()
+        try:
+            status = await fetch(session, url, headers)
+            if status != 200:
+                errors.append(status)
+                continue
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.monotonic() - started_at)
+
+
+async def run(url, concurrency, duration, use_cache):
+    headers = {} if use_cache else {"Cache-Control": "no-cache"}
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Warm up connections and caches before measuring
+        await asyncio.gather(*(fetch(session, url, headers) for _ in range(concurrency)))
+
+        started_at = time.monotonic()
+        deadline = started_at + duration
+        await asyncio.gather(
+            *(
+                run_client(session, url, headers, deadline, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.monotonic() - started_at
+
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run the load.")
+    parser.add_argument(
+        "--use-cache", action="store_true", help="Let responses come from the search cache."
+    )
+    args = parser.parse_args()
+
+    latencies, errors, elapsed = asyncio.run(
+        run(args.url, args.concurrency, args.duration, args.use_cache)
+    )
+    if not latencies:
+        raise SystemExit(f"No successful requests, errors: {errors[:10]}")
+
+    latencies.sort()
+    print(f"{args.url} with {args.concurrency} concurrent clients for {elapsed:.1f}s")
+    print(f"requests: {len(latencies)} ok, {len(errors)} failed")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(
+        f"latency: p50 {statistics.median(latencies) * 1000:.1f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms, "
+        f"max {latencies[-1] * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -143,6 +143,18 @@ CELERY_TIMEZONE = TIME_ZONE
 
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
 
+# CSV processing settings
+# "rows" sends the decoded CSV rows in every chunk message, "ranges" only sends byte offsets
+# and lets each worker read its own slice of the uploaded file from storage.
+CSV_CHUNK_TRANSPORT = os.environ.get("CSV_CHUNK_TRANSPORT", "rows")
+# Index the rows parsed by each chunk task directly instead of re-reading them from Postgres
+CSV_INDEX_FROM_ROWS = os.environ.get("CSV_INDEX_FROM_ROWS", "False").lower() == "true"
+
+# Search settings
+# Map search hits straight from the Elasticsearch response to dicts instead of building a
+# document and running the serializer for every hit
+SEARCH_FAST_READ_PATH = os.environ.get("SEARCH_FAST_READ_PATH", "False").lower() == "true"
+
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
 AWS_S3_ENDPOINT_URL = os.environ.get("AWS_S3_ENDPOINT_URL", "http://minio:9000")
@@ -184,5 +196,10 @@ ELASTICSEARCH_DSL = {
     }
 }
 
+# Also drop replicas while a bulk load job is indexing, they are restored once it finishes
+ELASTICSEARCH_BULK_LOAD_DROP_REPLICAS = (
+    os.environ.get("ELASTICSEARCH_BULK_LOAD_DROP_REPLICAS", "False").lower() == "true"
+)
+
 # Use Celery to process signals
 ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "django_elasticsearch_dsl.signals.CelerySignalProcessor"
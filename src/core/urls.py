@@ -1,8 +1,17 @@
 from django.urls import path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from organizations.async_views import (
+    get_organization_async_view,
+    search_organization_async_view,
+)
 from organizations.views import (
+    autocomplete_organization_view,
+    cache_stats_view,
     create_organization_view,
     get_organization_view,
+    get_organizations_batch_view,
+    organization_facets_view,
+    processing_job_status_view,
     search_organization_view,
     upload_csv_view,
 )
@@ -15,7 +24,39 @@ urlpatterns = [
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("organizations/", create_organization_view, name="organization-create"),
     path("organizations/upload-csv/", upload_csv_view, name="upload-csv"),
+    path(
+        "organizations/jobs/<int:job_id>/",
+        processing_job_status_view,
+        name="processing-job-status",
+    ),
     path("organizations/search/", search_organization_view, name="organization-search"),
+    path(
+        "organizations/autocomplete/",
+        autocomplete_organization_view,
+        name="organization-autocomplete",
+    ),
+    path(
+        "organizations/search/facets/",
+        organization_facets_view,
+        name="organization-search-facets",
+    ),
+    path("organizations/cache-stats/", cache_stats_view, name="organization-cache-stats"),
+    path(
+        "organizations/batch/",
+        get_organizations_batch_view,
+        name="organization-batch",
+    ),
+    # Async versions of the search and retrieve views, meant to be served by the ASGI app
+    path(
+        "organizations/async/search/",
+        search_organization_async_view,
+        name="organization-search-async",
+    ),
+    path(
+        "organizations/async/<str:organization_id>/",
+        get_organization_async_view,
+        name="organization-get-async",
+    ),
     path(
         "organizations/<str:organization_id>/",
         get_organization_view,
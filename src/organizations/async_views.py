@@ -0,0 +1,110 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import NotFoundError as ElasticsearchNotFoundError
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from organizations.documents import OrganizationDocument
+from organizations.paginators import ElasticsearchCursorPagination
+from organizations.renderers import ORJSONRenderer
+from organizations.serializers import (
+    OrganizationCreateSerializer,
+    OrganizationListRequestQueryParamsSerializer,
+)
+from organizations.services import (
+    SearchCache,
+    build_organization_search_query,
+    serialize_search_page,
+)
+
+# These views only await I/O, so under the ASGI app a single process can keep many searches
+# in flight. Served through WSGI each request runs in an event loop of its own, which is
+# closed once the response is returned.
+
+# The aiohttp session of a client can only be used from the event loop it was created in
+async_clients = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def get_async_client(request):
+    if isinstance(request, ASGIRequest):
+        loop = asyncio.get_running_loop()
+        client = async_clients.get(loop)
+        if client is None:
+            client = async_clients[loop] = AsyncElasticsearch(
+                **settings.ELASTICSEARCH_DSL["default"]
+            )
+        yield client
+        return
+
+    # Under WSGI the client can't outlive the request's event loop
+    client = AsyncElasticsearch(**settings.ELASTICSEARCH_DSL["default"])
+    try:
+        yield client
+    finally:
+        await client.close()
+
+
+# The cache calls are blocking Redis round trips, run them outside the event loop. They are
+# thread safe, so there is no need to serialize them on the main thread.
+def run_in_thread(func):
+    return sync_to_async(func, thread_sensitive=False)
+
+
+def json_response(data, headers=None):
+    return HttpResponse(
+        ORJSONRenderer().render(data), content_type="application/json", headers=headers
+    )
+
+
+@require_GET
+async def search_organization_async_view(request):
+    # Wrapping the request gives the paginator the query_params it expects
+    request = Request(request)
+    serializer = OrganizationListRequestQueryParamsSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    base_url = request.build_absolute_uri().split("?")[0]
+    cache_key = await run_in_thread(SearchCache.get_key)(base_url, request.query_params)
+    if not SearchCache.is_bypassed(request):
+        data = await run_in_thread(SearchCache.get)(cache_key)
+        if data is not None:
+            return json_response(data, headers={"X-Cache": "HIT"})
+
+    try:
+        search_query = build_organization_search_query(request.query_params)
+        paginator = ElasticsearchCursorPagination()
+        async with get_async_client(request._request) as client:
+            page = await paginator.apaginate_queryset(search_query, request, client)
+    except NotFound as e:
+        return JsonResponse({"detail": e.detail}, status=status.HTTP_404_NOT_FOUND)
+    except ElasticsearchNotFoundError as e:
+        return JsonResponse({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
+
+    results = serialize_search_page(page, request.query_params)
+    data = {"next": paginator.get_next_link(), "results": results}
+    if not SearchCache.is_private(request):
+        await run_in_thread(SearchCache.set)(cache_key, data)
+    return json_response(data, headers={"X-Cache": "MISS"})
+
+
+@require_GET
+async def get_organization_async_view(request, organization_id):
+    try:
+        async with get_async_client(request) as client:
+            response = await client.get(index=OrganizationDocument._index._name, id=organization_id)
+    except ElasticsearchNotFoundError as e:
+        return JsonResponse({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = OrganizationCreateSerializer(response["_source"])
+    return JsonResponse(serializer.data)
@@ -0,0 +1,198 @@
+import functools
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+INDEX_GENERATION_KEY = "search_index_generation"
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 1024, timeout: float | None = None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data: OrderedDict[Any, tuple[Any, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                return default
+
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        expires_at = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DocumentCache:
+    TIMEOUT = 60 * 60
+    # Other processes only drop their local copy when it expires, this bounds how long they
+    # can serve a document after it was updated
+    LOCAL_TIMEOUT = 5
+    local_cache = LRUCache(max_size=5_000, timeout=LOCAL_TIMEOUT)
+    stats = Counter()
+
+    @staticmethod
+    def get_key(organization_id: str) -> str:
+        return f"organization_document_{organization_id}"
+
+    @staticmethod
+    def get(organization_id: str) -> dict | None:
+        data = DocumentCache.local_cache.get(organization_id)
+        if data is not None:
+            DocumentCache.stats["local_hits"] += 1
+            return data
+
+        data = cache.get(DocumentCache.get_key(organization_id))
+        if data is not None:
+            DocumentCache.stats["redis_hits"] += 1
+            DocumentCache.local_cache.set(organization_id, data)
+            return data
+
+        DocumentCache.stats["misses"] += 1
+        return None
+
+    @staticmethod
+    def set(organization_id: str, data: dict, generation: int | None = None) -> None:
+        cache.set(DocumentCache.get_key(organization_id), data, timeout=DocumentCache.TIMEOUT)
+        DocumentCache.local_cache.set(organization_id, data)
+        # Writers bump the generation before they invalidate. If it moved since the data was
+        # read, the data may predate a write whose invalidation already ran, so drop it.
+        if generation is not None and get_index_generation() != generation:
+            DocumentCache.invalidate([organization_id])
+
+    @staticmethod
+    def invalidate(organization_ids: Iterable[str]) -> None:
+        organization_ids = set(organization_ids)
+        if not organization_ids:
+            return
+        cache.delete_many(
+            [DocumentCache.get_key(organization_id) for organization_id in organization_ids]
+        )
+        for organization_id in organization_ids:
+            DocumentCache.local_cache.delete(organization_id)
+
+    @staticmethod
+    def get_stats() -> dict[str, float]:
+        hits = DocumentCache.stats["local_hits"] + DocumentCache.stats["redis_hits"]
+        total = hits + DocumentCache.stats["misses"]
+        return {
+            "local_hits": DocumentCache.stats["local_hits"],
+            "redis_hits": DocumentCache.stats["redis_hits"],
+            "misses": DocumentCache.stats["misses"],
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+@functools.cache
+def get_redis_client() -> redis.Redis:
+    # For what Django's cache API lacks (bitmaps, locks), talk to the cache's Redis directly.
+    # Like RedisCache, writes go to the first server listed.
+    location = settings.CACHES["default"]["LOCATION"]
+    if isinstance(location, str):
+        location = location.split(",")
+    return redis.Redis.from_url(location[0])
+
+
+def increment_counter(key: str, delta: int = 1, timeout: int | None = None) -> int:
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=timeout)
+        return cache.incr(key, delta)
+
+
+def get_index_generation() -> int:
+    return cache.get(INDEX_GENERATION_KEY, 0)
+
+
+def bump_index_generation() -> None:
+    # Cached search results are keyed by generation, so any write makes them all stale
+    increment_counter(INDEX_GENERATION_KEY)
+
+
+class SingleFlight:
+    def __init__(self, timeout: float, lock_timeout: float = 5, poll_interval: float = 0.05):
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = {"done": threading.Event()}
+
+        # Threads of this process wait for the one that got here first
+        if not is_leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = self._do_shared(key, compute)
+            return call["result"]
+        except Exception as exc:
+            call["error"] = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def _do_shared(self, key: str, compute: Callable[[], Any]) -> Any:
+        lock_key = f"{key}_lock"
+        is_locked = cache.add(lock_key, 1, timeout=self.lock_timeout)
+
+        # Other processes wait for the one holding the lock to store the result
+        if not is_locked:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+                # The holder failed or its lock expired, stop waiting
+                if cache.get(lock_key) is None:
+                    break
+
+        try:
+            value = compute()
+            cache.set(key, value, timeout=self.timeout)
+            return value
+        finally:
+            if is_locked:
+                cache.delete(lock_key)
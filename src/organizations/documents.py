@@ -2,6 +2,7 @@ from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
 from elasticsearch_dsl import analyzer
 
+from organizations.caches import DocumentCache, bump_index_generation
 from organizations.models import Organization
 
 # Define a custom analyzer for the all_text field
@@ -19,6 +20,8 @@ class OrganizationDocument(Document):
         fields={
             "keyword": fields.KeywordField(),
             "text": fields.TextField(analyzer="standard"),
+            # Prefix lookups for autocomplete
+            "suggest": fields.SearchAsYouTypeField(max_shingle_size=3),
         },
         copy_to="all_text",
     )
@@ -73,3 +76,28 @@ class OrganizationDocument(Document):
     @classmethod
     def generate_id(cls, object_instance):
         return object_instance.organization_id
+
+    def _get_actions(self, object_list, action):
+        # Imported here because the index helpers are built on top of this document
+        from organizations.indexes import get_write_indices
+
+        write_indices = get_write_indices()
+        for document_action in super()._get_actions(object_list, action):
+            for index in write_indices:
+                yield {**document_action, "_index": index}
+
+    def _bulk(self, actions, *args, **kwargs):
+        organization_ids = []
+
+        def track(actions):
+            for action in actions:
+                organization_ids.append(action["_id"])
+                yield action
+
+        # Writes made by the signal processor end up here. A failed bulk request may still
+        # have updated some of them.
+        try:
+            return super()._bulk(track(actions), *args, **kwargs)
+        finally:
+            bump_index_generation()
+            DocumentCache.invalidate(organization_ids)
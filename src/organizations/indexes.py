@@ -0,0 +1,298 @@
+import logging
+import math
+import multiprocessing
+import re
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections as db_connections
+from django.db.models import Max, Min
+from elasticsearch.helpers import streaming_bulk
+from elasticsearch_dsl import connections
+from redis.lock import Lock
+
+from organizations.caches import LRUCache, bump_index_generation, get_redis_client
+from organizations.documents import OrganizationDocument
+from organizations.models import Organization
+
+logger = logging.getLogger(__name__)
+
+# Searches go through the read alias, which keeps the name the index always had.
+# Indexing goes through every index behind the write alias, so a rebuild in progress
+# receives the same writes as the live index.
+READ_ALIAS = OrganizationDocument._index._name
+WRITE_ALIAS = f"{READ_ALIAS}_write"
+WRITE_INDICES_CACHE_TIMEOUT = 5
+
+write_indices_cache = LRUCache(max_size=1, timeout=WRITE_INDICES_CACHE_TIMEOUT)
+
+BULK_LOAD_TIMEOUT = 60 * 60 * 24
+BULK_LOAD_JOBS_KEY = "bulk_load_jobs"
+BULK_LOAD_ORIGINAL_SETTINGS_KEY = "bulk_load_original_settings"
+BULK_LOAD_LOCK_KEY = "bulk_load_lock"
+BULK_LOAD_LOCK_TIMEOUT = 60
+BULK_LOAD_SETTINGS = ["index.refresh_interval", "index.number_of_replicas"]
+
+
+def get_bulk_load_job_key(job_id: int) -> str:
+    return f"bulk_load_job_{job_id}"
+
+
+def start_bulk_load(job_id: int) -> None:
+    # A redelivered or resumed job is already counted, end_bulk_load only counts it once
+    if not cache.add(get_bulk_load_job_key(job_id), 1, timeout=BULK_LOAD_TIMEOUT):
+        return
+
+    client = connections.get_connection()
+    index = READ_ALIAS
+
+    # The count and the saved settings change together, a job starting while the last one
+    # ends would otherwise save the bulk load settings as the original ones
+    with get_bulk_load_lock():
+        jobs = cache.get(BULK_LOAD_JOBS_KEY, 0)
+        cache.set(BULK_LOAD_JOBS_KEY, jobs + 1, timeout=BULK_LOAD_TIMEOUT)
+        # Several jobs may bulk load at the same time, only the first one sees the live settings
+        if jobs > 0:
+            return
+
+        response = client.indices.get_settings(index=index, flat_settings=True)
+        # Settings that were never set explicitly are stored as None, which resets them
+        original_settings = {
+            name: {setting: values["settings"].get(setting) for setting in BULK_LOAD_SETTINGS}
+            for name, values in response.items()
+        }
+        cache.set(BULK_LOAD_ORIGINAL_SETTINGS_KEY, original_settings, timeout=BULK_LOAD_TIMEOUT)
+
+        bulk_load_settings = {"index.refresh_interval": "-1"}
+        if settings.ELASTICSEARCH_BULK_LOAD_DROP_REPLICAS:
+            bulk_load_settings["index.number_of_replicas"] = 0
+
+        client.indices.put_settings(index=index, settings=bulk_load_settings)
+    logger.info(f"Bulk load settings applied to {index} for processing job {job_id}")
+
+
+def end_bulk_load(job_id: int, refresh: bool = False) -> None:
+    # Finishing twice (e.g. one error callback per failed chunk) must only count once
+    if not cache.delete(get_bulk_load_job_key(job_id)):
+        return
+
+    client = connections.get_connection()
+    index = READ_ALIAS
+
+    with get_bulk_load_lock():
+        jobs = cache.get(BULK_LOAD_JOBS_KEY, 0) - 1
+        if jobs > 0:
+            cache.set(BULK_LOAD_JOBS_KEY, jobs, timeout=BULK_LOAD_TIMEOUT)
+        else:
+            original_settings = cache.get(BULK_LOAD_ORIGINAL_SETTINGS_KEY) or {}
+            for name, index_settings in original_settings.items():
+                client.indices.put_settings(index=name, settings=index_settings)
+            cache.delete_many([BULK_LOAD_JOBS_KEY, BULK_LOAD_ORIGINAL_SETTINGS_KEY])
+            logger.info(f"Index settings of {index} restored after processing job {job_id}")
+
+    if refresh:
+        client.indices.refresh(index=index)
+
+
+def get_bulk_load_lock() -> Lock:
+    return get_redis_client().lock(
+        cache.make_key(BULK_LOAD_LOCK_KEY), timeout=BULK_LOAD_LOCK_TIMEOUT
+    )
+
+
+def get_document_source(org: Organization) -> dict:
+    return {
+        "id": org.id,
+        "organization_id": org.organization_id,
+        "name": org.name,
+        "website": org.website,
+        "country": org.country.name,
+        "description": org.description,
+        "founded": org.founded,
+        "industry": org.industry.type,
+        "number_of_employees": org.number_of_employees,
+    }
+
+
+def get_index_actions(
+    organizations: Iterable[Organization], indices: list[str]
+) -> Generator[dict, None, None]:
+    for org in organizations:
+        source = get_document_source(org)
+        for index in indices:
+            yield {
+                "_index": index,
+                "_id": org.organization_id,
+                "_source": source,
+                "doc_as_upsert": True,
+            }
+
+
+def get_alias_indices(alias: str) -> list[str]:
+    client = connections.get_connection()
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return sorted(client.indices.get_alias(name=alias))
+
+
+def get_read_indices() -> list[str]:
+    client = connections.get_connection()
+    if client.indices.exists_alias(name=READ_ALIAS):
+        return sorted(client.indices.get_alias(name=READ_ALIAS))
+    # Indices created before versioning are concrete indices named like the alias
+    if client.indices.exists(index=READ_ALIAS):
+        return [READ_ALIAS]
+    return []
+
+
+def get_write_indices() -> list[str]:
+    indices = write_indices_cache.get(WRITE_ALIAS)
+    if indices is None:
+        indices = get_alias_indices(WRITE_ALIAS) or [READ_ALIAS]
+        write_indices_cache.set(WRITE_ALIAS, indices)
+    return indices
+
+
+def create_versioned_index() -> str:
+    client = connections.get_connection()
+    pattern = re.compile(rf"^{re.escape(READ_ALIAS)}_v(\d+)$")
+    existing = client.indices.get(index=f"{READ_ALIAS}_v*", allow_no_indices=True)
+    versions = [int(match.group(1)) for name in existing if (match := pattern.match(name))]
+
+    name = f"{READ_ALIAS}_v{max(versions, default=0) + 1}"
+    OrganizationDocument._index.clone(name=name).create()
+    return name
+
+
+def add_write_index(index: str) -> None:
+    client = connections.get_connection()
+    indices = get_alias_indices(WRITE_ALIAS) or get_read_indices()
+    client.indices.update_aliases(
+        actions=[{"add": {"index": name, "alias": WRITE_ALIAS}} for name in [*indices, index]]
+    )
+    write_indices_cache.clear()
+
+
+def discard_index(index: str) -> None:
+    client = connections.get_connection()
+    # Deleting the index also takes it out of the write alias
+    client.indices.delete(index=index)
+    write_indices_cache.clear()
+
+
+def get_id_ranges(parts: int) -> list[tuple[int, int]]:
+    bounds = Organization.objects.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return []
+
+    step = math.ceil((bounds["last"] - bounds["first"] + 1) / parts)
+    return [
+        (start, min(start + step - 1, bounds["last"]))
+        for start in range(bounds["first"], bounds["last"] + 1, step)
+    ]
+
+
+def index_id_range(
+    indices: list[str], start: int, end: int, batch_size: int = 2000
+) -> tuple[int, int]:
+    client = connections.get_connection()
+    # iterator() streams the range through a server-side cursor on PostgreSQL
+    organizations = (
+        Organization.objects.filter(id__gte=start, id__lte=end)
+        .select_related("country", "industry")
+        .iterator(chunk_size=batch_size)
+    )
+
+    indexed = failed = 0
+    for ok, item in streaming_bulk(
+        client,
+        get_index_actions(organizations, indices),
+        chunk_size=batch_size,
+        raise_on_error=False,
+    ):
+        if ok:
+            indexed += 1
+        else:
+            failed += 1
+            logger.error(f"Failed to index organization: {item}")
+
+    return indexed, failed
+
+
+def init_reindex_worker() -> None:
+    # Forked workers must not reuse the sockets of the parent process
+    db_connections.close_all()
+    connections.remove_connection("default")
+    connections.create_connection("default", **settings.ELASTICSEARCH_DSL["default"])
+
+
+def populate_index(
+    indices: list[str],
+    batch_size: int = 2000,
+    workers: int = 1,
+    progress: Callable[[int, int], None] | None = None,
+) -> tuple[int, int]:
+    # Several ranges per worker keep the pool busy when the id space has gaps
+    ranges = get_id_ranges(max(workers, 1) * 4)
+    indexed = failed = 0
+
+    if workers <= 1:
+        for start, end in ranges:
+            range_indexed, range_failed = index_id_range(indices, start, end, batch_size)
+            indexed, failed = indexed + range_indexed, failed + range_failed
+            if progress:
+                progress(indexed, failed)
+    else:
+        db_connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_reindex_worker,
+        ) as executor:
+            futures = [
+                executor.submit(index_id_range, indices, start, end, batch_size)
+                for start, end in ranges
+            ]
+            for future in as_completed(futures):
+                range_indexed, range_failed = future.result()
+                indexed, failed = indexed + range_indexed, failed + range_failed
+                if progress:
+                    progress(indexed, failed)
+
+    connections.get_connection().indices.refresh(index=",".join(indices))
+    bump_index_generation()
+    return indexed, failed
+
+
+def swap_aliases(index: str, delete_old: bool = True) -> list[str]:
+    client = connections.get_connection()
+    old_indices = [name for name in get_read_indices() if name != index]
+
+    actions = []
+    for name in old_indices:
+        if name == READ_ALIAS:
+            # A concrete index has to go before its name can become an alias
+            actions.append({"remove_index": {"index": name}})
+        else:
+            actions.append({"remove": {"index": name, "alias": READ_ALIAS}})
+
+    for name in get_alias_indices(WRITE_ALIAS):
+        if name not in (index, READ_ALIAS):
+            actions.append({"remove": {"index": name, "alias": WRITE_ALIAS}})
+
+    actions.append({"add": {"index": index, "alias": READ_ALIAS}})
+    actions.append({"add": {"index": index, "alias": WRITE_ALIAS}})
+
+    # Every alias change is applied in one atomic request
+    client.indices.update_aliases(actions=actions)
+    write_indices_cache.clear()
+    bump_index_generation()
+
+    if delete_old:
+        for name in old_indices:
+            if name != READ_ALIAS:
+                client.indices.delete(index=name)
+
+    return old_indices
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.indexes import (
+    READ_ALIAS,
+    WRITE_ALIAS,
+    WRITE_INDICES_CACHE_TIMEOUT,
+    add_write_index,
+    create_versioned_index,
+    discard_index,
+    populate_index,
+    swap_aliases,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        f"Build a new versioned organizations index from Postgres and atomically point the "
+        f"{READ_ALIAS!r} and {WRITE_ALIAS!r} aliases to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Number of processes indexing in parallel."
+        )
+        parser.add_argument(
+            "--keep-old",
+            action="store_true",
+            help="Keep the previous versioned indices after the swap.",
+        )
+
+    def handle(self, *args, **options):
+        index = create_versioned_index()
+        self.stdout.write(f"Created index {index}")
+
+        # From now on every write also goes to the new index
+        add_write_index(index)
+        # Wait until no process uses a write index list cached before the change
+        time.sleep(WRITE_INDICES_CACHE_TIMEOUT)
+
+        started_at = time.monotonic()
+        try:
+            indexed, failed = populate_index(
+                [index], batch_size=options["batch_size"], workers=options["workers"]
+            )
+        except Exception:
+            discard_index(index)
+            raise
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            f"Indexed {indexed} organizations into {index} in {elapsed:.1f}s "
+            f"({indexed / max(elapsed, 0.001):.0f} docs/s)"
+        )
+
+        if failed:
+            discard_index(index)
+            raise CommandError(f"{failed} organizations failed to index, {index} was discarded")
+
+        old_indices = swap_aliases(index, delete_old=not options["keep_old"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{READ_ALIAS!r} now points to {index} (was {old_indices})")
+        )
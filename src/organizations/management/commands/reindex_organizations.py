@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.indexes import get_write_indices, populate_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Reindex every organization from Postgres into the current write indices, "
+        "splitting the id space across a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Number of processes indexing in parallel."
+        )
+
+    def handle(self, *args, **options):
+        indices = get_write_indices()
+        started_at = time.monotonic()
+
+        def report(indexed, failed):
+            elapsed = max(time.monotonic() - started_at, 0.001)
+            self.stdout.write(
+                f"{indexed} indexed, {failed} failed ({indexed / elapsed:.0f} docs/s)"
+            )
+
+        indexed, failed = populate_index(
+            indices,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            progress=report,
+        )
+
+        elapsed = max(time.monotonic() - started_at, 0.001)
+        if failed:
+            raise CommandError(f"{failed} organizations failed to index")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {indexed} organizations into {', '.join(indices)} in {elapsed:.1f}s "
+                f"({indexed / elapsed:.0f} docs/s)"
+            )
+        )
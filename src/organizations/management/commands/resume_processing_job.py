@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.models import ProcessingJob
+from organizations.services import resume_processing_job
+from organizations.tasks import JobCheckpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispatch again the chunks of a failed or interrupted processing job that haven't "
+        "been saved and indexed yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_id", type=int)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Resume a job that is still pending, e.g. after its workers were killed.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            processing_job = ProcessingJob.objects.get(id=options["job_id"])
+        except ProcessingJob.DoesNotExist:
+            raise CommandError(f"Processing job {options['job_id']} not found") from None
+
+        if processing_job.status == ProcessingJob.Status.SUCCESS:
+            raise CommandError(f"Processing job {processing_job.id} already succeeded")
+        if processing_job.status == ProcessingJob.Status.PENDING and not options["force"]:
+            raise CommandError(
+                f"Processing job {processing_job.id} is still pending, use --force to resume it"
+            )
+
+        completed = JobCheckpoints.count(processing_job.id)
+        resume_processing_job(processing_job)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resumed processing job {processing_job.id}, {completed} chunks already completed"
+            )
+        )
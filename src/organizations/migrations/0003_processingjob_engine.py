@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0002_processingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='engine',
+            field=models.CharField(choices=[('ORM', 'Orm'), ('COPY', 'Copy')], default='ORM'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0003_processingjob_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='bulk_load',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0004_processingjob_bulk_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
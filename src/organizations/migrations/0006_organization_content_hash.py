@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0005_processingjob_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='content_hash',
+            field=models.CharField(db_default='', max_length=32),
+        ),
+    ]
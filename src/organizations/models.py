@@ -24,6 +24,8 @@ class Organization(models.Model):
     founded = models.PositiveIntegerField()
     industry = models.ForeignKey(Industry, on_delete=models.CASCADE)
     number_of_employees = models.IntegerField(blank=True, null=True)
+    # Hash of the content last indexed, rows loaded again unchanged are skipped
+    content_hash = models.CharField(max_length=32, db_default="")
 
     def __str__(self):
         return self.name
@@ -35,8 +37,16 @@ class ProcessingJob(models.Model):
         SUCCESS = "SUCCESS"
         ERROR = "ERROR"
 
+    class Engine(models.TextChoices):
+        ORM = "ORM"
+        COPY = "COPY"
+
     file = models.FileField(upload_to="uploads/")
     status = models.CharField(choices=Status.choices, default=Status.PENDING)
+    engine = models.CharField(choices=Engine.choices, default=Engine.ORM)
+    bulk_load = models.BooleanField(default=False)
+    # Counters kept in Redis while the job runs, saved once it finishes
+    progress = models.JSONField(default=dict, blank=True)
     started_at = models.DateTimeField(blank=True, null=True)
     finished_at = models.DateTimeField(blank=True, null=True)
     error_message = models.TextField(blank=True, null=True)
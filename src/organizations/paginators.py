@@ -2,7 +2,9 @@ import json
 from base64 import b64decode, b64encode
 from urllib.parse import urlencode
 
+from elasticsearch_dsl import connections
 from rest_framework.exceptions import NotFound
+from rest_framework.fields import BooleanField
 from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
 
@@ -14,13 +16,66 @@ class ElasticsearchCursorPagination(BasePagination):
         max_page_size=100,
         cursor_query_param="cursor",
         page_size_query_param="page_size",
+        pit_query_param="pit",
+        pit_keep_alive="1m",
     ):
         self.page_size = page_size
         self.max_page_size = max_page_size
         self.cursor_query_param = cursor_query_param
         self.page_size_query_param = page_size_query_param
+        self.pit_query_param = pit_query_param
+        self.pit_keep_alive = pit_keep_alive
+        self.pit_id = None
 
     def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+
+        if self.is_new_pit(request):
+            self.pit_id = self.open_pit(queryset)
+            queryset = self.use_pit(queryset)
+
+        # Elasticsearch DSL's Search object uses lazy execution. It doesn't actually
+        # execute the query until we try to iterate over it or convert it to a list.
+        self.page = list(queryset)
+
+        if self.pit_id is not None:
+            # The PIT id may change between requests, the latest one must be used.
+            # execute() returns the response cached while iterating.
+            self.pit_id = queryset.execute().pit_id
+            if len(self.page) <= self.page_size:
+                self.close_pit()
+
+        return self.page[: self.page_size]
+
+    async def apaginate_queryset(self, queryset, request, client):
+        # Same as paginate_queryset, with every request sent through an AsyncElasticsearch client
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+
+        if self.is_new_pit(request):
+            response = await client.open_point_in_time(
+                index=queryset._index, keep_alive=self.pit_keep_alive
+            )
+            self.pit_id = response["id"]
+            queryset = self.use_pit(queryset)
+
+        response = await client.search(
+            index=queryset._index, body=queryset.to_dict(), **queryset._params
+        )
+        response = queryset._response_class(queryset, response.body)
+        self.page = list(response)
+
+        if self.pit_id is not None:
+            self.pit_id = response.pit_id
+            if len(self.page) <= self.page_size:
+                await client.close_point_in_time(id=self.pit_id)
+
+        return self.page[: self.page_size]
+
+    def get_page_queryset(self, queryset, request):
         self.page_size = self.get_page_size(request)
         if not self.page_size:
             return None
@@ -31,16 +86,38 @@ class ElasticsearchCursorPagination(BasePagination):
         # Decode the cursor from the request query parameters
         self.cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
 
+        # Cursors of point-in-time pages carry the PIT id along with the sort values
+        search_after = self.cursor
+        if isinstance(self.cursor, dict):
+            self.pit_id = self.cursor.get("pit_id")
+            search_after = self.cursor.get("search_after")
+            queryset = self.use_pit(queryset)
+
         # If a cursor exists, use Elasticsearch's search_after for pagination.
-        if self.cursor is not None:
-            queryset = queryset.extra(search_after=self.cursor)
+        if search_after is not None:
+            queryset = queryset.extra(search_after=search_after)
 
-        # Elasticsearch DSL's Search object uses lazy execution. It doesn't actually
-        # execute the query until we try to iterate over it or convert it to a list.
         # Fetch one extra item to determine if there's a next page
-        self.page = list(queryset[: self.page_size + 1])
+        return queryset[: self.page_size + 1]
 
-        return self.page[: self.page_size]
+    def is_new_pit(self, request):
+        return self.cursor is None and self.is_pit_request(request)
+
+    def use_pit(self, queryset):
+        # Searches against a PIT must not name an index, the PIT already pins it
+        return queryset.index().extra(pit={"id": self.pit_id, "keep_alive": self.pit_keep_alive})
+
+    def is_pit_request(self, request):
+        return request.query_params.get(self.pit_query_param) in BooleanField.TRUE_VALUES
+
+    def open_pit(self, queryset):
+        client = connections.get_connection()
+        response = client.open_point_in_time(index=queryset._index, keep_alive=self.pit_keep_alive)
+        return response["id"]
+
+    def close_pit(self):
+        # Free the PIT on the last page instead of waiting for the keep-alive to expire
+        connections.get_connection().close_point_in_time(id=self.pit_id)
 
     def get_paginated_response(self, data):
         return Response({"next": self.get_next_link(), "results": data})
@@ -56,8 +133,17 @@ class ElasticsearchCursorPagination(BasePagination):
         return f"{self.base_url}?{urlencode(self.request_query_params)}"
 
     def get_next_cursor(self):
-        last_item = self.page[-1]
-        return [str(value) for value in last_item.meta.sort]
+        # The extra item fetched only tells there's a next page, the next page starts after
+        # the last item of this one
+        last_item = self.page[self.page_size - 1]
+        if self.pit_id is not None:
+            # Keep the raw values, PIT sorts end with the numeric _shard_doc tiebreaker
+            return {"pit_id": self.pit_id, "search_after": list(self.get_sort(last_item))}
+        return [str(value) for value in self.get_sort(last_item)]
+
+    def get_sort(self, item):
+        # Raw hits from the fast read path are plain dicts
+        return item["sort"] if isinstance(item, dict) else item.meta.sort
 
     def encode_cursor(self, cursor):
         return b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
@@ -13,14 +13,22 @@ class OrganizationCreateSerializer(serializers.Serializer):
     industry = serializers.CharField()
     number_of_employees = serializers.IntegerField()
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets, only the requested fields are serialized
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class FileUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProcessingJob
-        fields = ["file"]
+        fields = ["file", "engine", "bulk_load"]
 
 
 class FileUploadResponseSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
     file = serializers.CharField()
     processing_status = serializers.CharField()
 
@@ -39,3 +47,79 @@ class OrganizationListRequestQueryParamsSerializer(serializers.Serializer):
     founded_max = serializers.IntegerField(required=False)
     cursor = serializers.CharField(required=False)
     page_size = serializers.IntegerField(required=False, min_value=1, max_value=100)
+    pit = serializers.BooleanField(required=False)
+    fields = serializers.CharField(required=False)
+
+    def validate_fields(self, value):
+        fields = {field.strip() for field in value.split(",") if field.strip()}
+        unknown = fields - set(OrganizationCreateSerializer().fields)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return value
+
+
+class OrganizationFacetsRequestQueryParamsSerializer(serializers.Serializer):
+    q = serializers.CharField(required=False)
+    country = serializers.CharField(required=False)
+    industry = serializers.CharField(required=False)
+    founded_min = serializers.IntegerField(required=False)
+    founded_max = serializers.IntegerField(required=False)
+    founded_interval = serializers.IntegerField(required=False, min_value=1)
+
+
+class FacetBucketSerializer(serializers.Serializer):
+    key = serializers.JSONField()
+    count = serializers.IntegerField()
+
+
+class OrganizationFacetsResponseSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    country = FacetBucketSerializer(many=True)
+    industry = FacetBucketSerializer(many=True)
+    founded = FacetBucketSerializer(many=True)
+
+
+class AutocompleteRequestQueryParamsSerializer(serializers.Serializer):
+    q = serializers.CharField(trim_whitespace=True)
+    limit = serializers.IntegerField(required=False, default=5, min_value=1, max_value=10)
+
+
+class OrganizationSuggestionSerializer(serializers.Serializer):
+    organization_id = serializers.CharField()
+    name = serializers.CharField()
+
+
+class OrganizationBatchRequestSerializer(serializers.Serializer):
+    organization_ids = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=100
+    )
+
+
+class OrganizationBatchResponseSerializer(serializers.Serializer):
+    found = OrganizationCreateSerializer(many=True)
+    missing = serializers.ListField(child=serializers.CharField())
+
+
+class ProcessingJobProgressSerializer(serializers.Serializer):
+    chunks_dispatched = serializers.IntegerField()
+    chunks_parsed = serializers.IntegerField()
+    chunks_indexed = serializers.IntegerField()
+    rows_accepted = serializers.IntegerField()
+    rows_rejected = serializers.IntegerField()
+    # Jobs finished before unchanged rows were skipped don't have this counter
+    rows_unchanged = serializers.IntegerField(default=0)
+    bytes_read = serializers.IntegerField()
+
+
+class ProcessingJobStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=ProcessingJob.Status.choices)
+    error_message = serializers.CharField(allow_null=True)
+    started_at = serializers.DateTimeField(allow_null=True)
+    finished_at = serializers.DateTimeField(allow_null=True)
+    total_bytes = serializers.IntegerField()
+    progress = ProcessingJobProgressSerializer()
+    percent = serializers.FloatField(allow_null=True)
+    rows_per_second = serializers.FloatField(allow_null=True)
+    bytes_per_second = serializers.FloatField(allow_null=True)
+    eta_seconds = serializers.FloatField(allow_null=True)
@@ -1,8 +1,25 @@
-from elasticsearch_dsl import Q
+import hashlib
+import json
+from collections.abc import Callable
 
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from elasticsearch_dsl import Q, connections
+from elasticsearch_dsl.response import Response
+
+from organizations.caches import (
+    DocumentCache,
+    LRUCache,
+    SingleFlight,
+    get_index_generation,
+    increment_counter,
+)
 from organizations.documents import OrganizationDocument
 from organizations.models import Country, Industry, Organization, ProcessingJob
-from organizations.tasks import process_csv
+from organizations.paginators import ElasticsearchCursorPagination
+from organizations.serializers import OrganizationCreateSerializer
+from organizations.tasks import JobProgress, process_csv
 
 
 def create_organization(data):
@@ -23,15 +40,115 @@ def create_organization(data):
     return organization
 
 
-def create_processing_job(file):
-    processing_job = ProcessingJob.objects.create(file=file)
+def create_processing_job(file, engine=ProcessingJob.Engine.ORM, bulk_load=False):
+    processing_job = ProcessingJob.objects.create(file=file, engine=engine, bulk_load=bulk_load)
     process_csv.delay(processing_job.id)
     return {
+        "id": processing_job.id,
         "file": processing_job.file.url,
         "processing_status": processing_job.status,
     }
 
 
+def resume_processing_job(processing_job):
+    # Chunks checkpointed by the earlier run are skipped by the dispatcher
+    processing_job.status = ProcessingJob.Status.PENDING
+    processing_job.error_message = None
+    processing_job.finished_at = None
+    processing_job.save(update_fields=["status", "error_message", "finished_at"])
+    process_csv.delay(processing_job.id)
+
+
+# Only what the paginator and the serializer read is sent back by Elasticsearch
+SEARCH_FILTER_PATH = [
+    "hits.hits._id",
+    "hits.hits._index",
+    "hits.hits._source",
+    "hits.hits.sort",
+    "pit_id",
+]
+
+
+class FilteredResponse(Response):
+    # filter_path drops the keys that end up empty, like the hits of a search without results
+    def __init__(self, search, response, doc_class=None):
+        response.setdefault("hits", {}).setdefault("hits", [])
+        super().__init__(search, response, doc_class)
+
+
+class RawHitsResponse(FilteredResponse):
+    # The fast read path uses the hits as returned by Elasticsearch, building a document for
+    # every hit costs more than the whole serialization
+    @property
+    def hits(self):
+        return self._d_["hits"]["hits"]
+
+
+ORGANIZATION_FIELDS = list(OrganizationCreateSerializer().fields)
+
+
+def serialize_search_page(page, query_params):
+    fields = get_requested_fields(query_params)
+    if not settings.SEARCH_FAST_READ_PATH:
+        return OrganizationCreateSerializer(page, many=True, fields=fields).data
+
+    # _source was indexed from validated organizations, it only needs the fields picked
+    fields = fields or ORGANIZATION_FIELDS
+    return [{field: hit["_source"].get(field) for field in fields} for hit in page]
+
+
+def get_requested_fields(query_params):
+    if not query_params.get("fields"):
+        return None
+    return [field.strip() for field in query_params["fields"].split(",") if field.strip()]
+
+
+def get_processing_job_status(processing_job):
+    progress = JobProgress.get(processing_job.id) if not processing_job.finished_at else None
+    if progress is not None:
+        started_at = progress.pop("started_at") or None
+        total_bytes = progress.pop("total_bytes")
+        finished_at = timezone.now()
+    else:
+        # Jobs not started yet, or finished before a counter existed, miss some counters
+        progress = dict.fromkeys(JobProgress.COUNTERS, 0) | processing_job.progress
+        started_at = processing_job.started_at
+        total_bytes = progress.pop("total_bytes", 0)
+        finished_at = processing_job.finished_at
+
+    status = {
+        "id": processing_job.id,
+        "status": processing_job.status,
+        "error_message": processing_job.error_message,
+        "started_at": started_at,
+        "finished_at": processing_job.finished_at,
+        "total_bytes": total_bytes,
+        "progress": progress,
+        "percent": None,
+        "rows_per_second": None,
+        "bytes_per_second": None,
+        "eta_seconds": None,
+    }
+    if not started_at or not finished_at:
+        return status
+
+    elapsed = max((finished_at - started_at).total_seconds(), 0.001)
+    status["rows_per_second"] = progress.get("rows_accepted", 0) / elapsed
+    status["bytes_per_second"] = progress.get("bytes_read", 0) / elapsed
+
+    if processing_job.status == ProcessingJob.Status.SUCCESS:
+        status["percent"], status["eta_seconds"] = 100.0, 0.0
+    elif total_bytes and progress.get("chunks_parsed"):
+        # Share of the file parsed, scaled by the share of parsed chunks already indexed
+        parsed = min(progress["bytes_read"] / total_bytes, 1.0)
+        done = parsed * progress["chunks_indexed"] / progress["chunks_parsed"]
+        status["percent"] = done * 100
+        if done and processing_job.status == ProcessingJob.Status.PENDING:
+            status["eta_seconds"] = elapsed * (1 - done) / done
+
+    return status
+
+
 def build_organization_search_query(query_params):
     s = OrganizationDocument.search()
 
@@ -58,8 +175,165 @@ def build_organization_search_query(query_params):
     # Use unique organization_id field as a tiebreaker
     s = s.sort({"_score": {"order": "desc"}}, {"organization_id": {"order": "asc"}})
 
+    fields = get_requested_fields(query_params)
+    if fields:
+        s = s.source(includes=fields)
+
+    s = s.params(filter_path=SEARCH_FILTER_PATH).response_class(
+        RawHitsResponse if settings.SEARCH_FAST_READ_PATH else FilteredResponse
+    )
+
+    return s
+
+
+FACET_SIZE = 50
+FOUNDED_FACET_INTERVAL = 10
+
+
+def build_organization_facets_query(query_params):
+    # Only the aggregations are needed, so no hits and no sorting
+    s = (
+        build_organization_search_query(query_params)
+        .sort()
+        .extra(size=0, track_total_hits=True)
+        .params(filter_path=["hits.total", "aggregations"])
+        .response_class(FilteredResponse)
+    )
+
+    s.aggs.bucket("country", "terms", field="country.keyword", size=FACET_SIZE)
+    s.aggs.bucket("industry", "terms", field="industry.keyword", size=FACET_SIZE)
+    s.aggs.bucket(
+        "founded",
+        "histogram",
+        field="founded",
+        interval=int(query_params.get("founded_interval") or FOUNDED_FACET_INTERVAL),
+        min_doc_count=1,
+    )
+
     return s
 
 
+def get_organization_facets(query_params):
+    response = build_organization_facets_query(query_params).execute()
+    facets = {"total": response.hits.total.value}
+    for name in ["country", "industry", "founded"]:
+        facets[name] = [
+            {"key": bucket.key, "count": bucket.doc_count}
+            for bucket in response.aggregations[name].buckets
+        ]
+    return facets
+
+
+# Typeahead requests repeat the same prefixes a lot, a short lived local cache answers most of
+# them without leaving the process
+autocomplete_cache = LRUCache(max_size=2048, timeout=60)
+
+
+def autocomplete_organizations(query: str, limit: int = 5) -> list[dict]:
+    query = " ".join(query.lower().split())
+    key = (query, limit)
+    suggestions = autocomplete_cache.get(key)
+    if suggestions is not None:
+        return suggestions
+
+    client = connections.get_connection()
+    response = client.search(
+        index=OrganizationDocument._index._name,
+        query={
+            "multi_match": {
+                "query": query,
+                "type": "bool_prefix",
+                "fields": ["name.suggest", "name.suggest._2gram", "name.suggest._3gram"],
+            }
+        },
+        size=limit,
+        source=["organization_id", "name"],
+        # Skip the hit metadata and total count, only the sources are used
+        track_total_hits=False,
+        filter_path=["hits.hits._source"],
+    )
+
+    suggestions = [hit["_source"] for hit in response.get("hits", {}).get("hits", [])]
+    autocomplete_cache.set(key, suggestions)
+    return suggestions
+
+
 def get_organization(organization_id):
     return OrganizationDocument.get(id=organization_id)
+
+
+def get_organization_data(organization_id):
+    # Read-through cache of the serialized document, invalidated whenever it's indexed
+    generation = get_index_generation()
+    data = DocumentCache.get(organization_id)
+    if data is None:
+        data = dict(OrganizationCreateSerializer(get_organization(organization_id)).data)
+        DocumentCache.set(organization_id, data, generation=generation)
+    return data
+
+
+def get_organizations(organization_ids):
+    # Duplicates are fetched once, the order of the request is kept
+    organization_ids = list(dict.fromkeys(organization_ids))
+    documents = OrganizationDocument.mget(organization_ids, missing="none")
+
+    found, missing = [], []
+    for organization_id, document in zip(organization_ids, documents, strict=True):
+        if document is None:
+            missing.append(organization_id)
+        else:
+            found.append(document)
+    return found, missing
+
+
+class SearchCache:
+    TIMEOUT = 300
+    HITS_KEY = "search_cache_hits"
+    MISSES_KEY = "search_cache_misses"
+    # Identical searches that miss the cache at the same time share one Elasticsearch query
+    flight = SingleFlight(timeout=TIMEOUT)
+
+    @staticmethod
+    def get_key(base_url: str, query_params) -> str:
+        # Parameter order and empty values don't change the response
+        params = sorted(
+            (param, value) for param, values in query_params.lists() for value in values if value
+        )
+        digest = hashlib.sha256(json.dumps([base_url, params]).encode("utf-8")).hexdigest()
+        return f"search_{get_index_generation()}_{digest}"
+
+    @staticmethod
+    def is_bypassed(request) -> bool:
+        if SearchCache.is_private(request):
+            return True
+        return "no-cache" in request.headers.get("Cache-Control", "")
+
+    @staticmethod
+    def is_private(request) -> bool:
+        # Point-in-time pages belong to the client that opened the PIT, they are never stored
+        return ElasticsearchCursorPagination().is_pit_request(request)
+
+    @staticmethod
+    def get(key: str) -> dict | None:
+        data = cache.get(key)
+        increment_counter(SearchCache.HITS_KEY if data is not None else SearchCache.MISSES_KEY)
+        return data
+
+    @staticmethod
+    def set(key: str, data: dict) -> None:
+        cache.set(key, data, timeout=SearchCache.TIMEOUT)
+
+    @staticmethod
+    def get_or_compute(key: str, compute: Callable[[], dict]) -> dict:
+        return SearchCache.flight.do(key, compute)
+
+    @staticmethod
+    def get_stats() -> dict[str, float]:
+        stats = cache.get_many([SearchCache.HITS_KEY, SearchCache.MISSES_KEY])
+        hits = stats.get(SearchCache.HITS_KEY, 0)
+        misses = stats.get(SearchCache.MISSES_KEY, 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from organizations.models import Country, Industry
+from organizations.tasks import CacheManager
+
+
+@receiver(post_delete, sender=Country)
+@receiver(post_delete, sender=Industry)
+def invalidate_reference_data(sender, instance, **kwargs):
+    CacheManager.invalidate()
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=Industry)
+def invalidate_renamed_reference_data(sender, instance, created, **kwargs):
+    # New rows can't be stale in the cache, renamed ones can
+    if not created:
+        CacheManager.invalidate()
@@ -1,15 +1,45 @@
+import base64
+import bz2
 import csv
-from collections.abc import Generator
+import gzip
+import hashlib
+import io
+import time
+from collections import Counter
+from collections.abc import Generator, Iterable
+from datetime import datetime
+from itertools import islice
 from typing import Any
 
-from celery import chord, group, shared_task
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import zstandard
+from celery import Signature, group, shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.core.cache import cache
 from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
 from elasticsearch.helpers import bulk
 from elasticsearch_dsl import connections
+from minio_storage.storage import MinioStorage
 
-from organizations.documents import OrganizationDocument
+from organizations.caches import (
+    DocumentCache,
+    LRUCache,
+    bump_index_generation,
+    get_redis_client,
+    increment_counter,
+)
+from organizations.indexes import (
+    end_bulk_load,
+    get_index_actions,
+    get_write_indices,
+    start_bulk_load,
+)
 from organizations.models import Country, Industry, Organization, ProcessingJob
 
 logger = get_task_logger(__name__)
@@ -24,6 +54,48 @@ class IndexingError(Exception):
 
 
 CHUNK_SIZE = 500
+UPSERT_FIELDS = [
+    "name",
+    "website",
+    "country_id",
+    "description",
+    "founded",
+    "industry_id",
+    "number_of_employees",
+]
+DISPATCH_WINDOW_SIZE = 50
+MAX_CHUNKS_IN_FLIGHT = 200
+DISPATCH_POLL_INTERVAL = 1
+COMPRESSION_MAGIC_NUMBERS = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+PARQUET_MAGIC_NUMBER = b"PAR1"
+# Row groups are read in batches this large, then cut to fit in a broker message. SQS takes
+# 256KB, kombu base64 encodes the body twice on the way.
+PARQUET_BATCH_SIZE = CHUNK_SIZE * 100
+PARQUET_MAX_MESSAGE_BYTES = 128 * 1024
+# Parquet columns are named like the CSV header
+PARQUET_COLUMNS = {
+    "Organization Id": "organization_id",
+    "Name": "name",
+    "Website": "website",
+    "Country": "country",
+    "Description": "description",
+    "Founded": "founded",
+    "Industry": "industry",
+    "Number of employees": "number_of_employees",
+}
+# A single value Postgres refuses would fail the COPY of the whole batch
+INTEGER_RANGE = (-(2**31), 2**31 - 1)
+MAX_LENGTHS = {
+    "organization_id": Organization._meta.get_field("organization_id").max_length,
+    "name": Organization._meta.get_field("name").max_length,
+    "website": Organization._meta.get_field("website").max_length,
+    "country": Country._meta.get_field("name").max_length,
+    "industry": Industry._meta.get_field("type").max_length,
+}
 
 
 @shared_task(name="process_csv", acks_late=True)
@@ -33,12 +105,59 @@ def process_csv(job_id: int) -> None:
         file_processor = FileProcessor(processing_job.file)
         chunk_processor = ChunkProcessor()
 
-        chains = [
-            chunk_processor.process_chunk.s(chunk) | index_chunk.s()
-            for chunk in file_processor.get_chunks()
-        ]
+        if processing_job.bulk_load:
+            start_bulk_load(job_id)
+
+        # A resumed or redelivered job carries on with the progress it had made. The size of
+        # a compressed file is only known once the dispatcher has read through it.
+        JobProgress.start(
+            job_id,
+            0 if file_processor.compression else processing_job.file.size,
+            started_at=processing_job.started_at,
+            progress=processing_job.progress,
+        )
 
-        chord(group(*chains))(handle_results.s(job_id).on_error(handle_error.s(job_id)))
+        if file_processor.is_parquet:
+            # Row groups may hold a million rows, they are read in batches that are shipped
+            # like CSV chunks ship rows
+            chunks = (
+                (
+                    i,
+                    chunk_processor.process_record_batch.s(
+                        batch, job_id=job_id, size=size, chunk_index=i
+                    ),
+                )
+                for i, (batch, size) in enumerate(file_processor.get_record_batches())
+            )
+        # Offsets into a compressed file can't be read on their own, its chunks ship rows
+        elif settings.CSV_CHUNK_TRANSPORT == "ranges" and not file_processor.compression:
+            # Only ship byte offsets through the broker, workers read their own slice
+            chunks = (
+                (i, chunk_processor.process_chunk_range.s(job_id, start, end, chunk_index=i))
+                for i, (start, end) in enumerate(file_processor.get_byte_ranges())
+            )
+        else:
+            chunks = (
+                (
+                    i,
+                    chunk_processor.process_chunk.s(
+                        chunk, engine=processing_job.engine, job_id=job_id, chunk_index=i
+                    ),
+                )
+                for i, chunk in enumerate(file_processor.get_chunks())
+            )
+
+        if settings.CSV_INDEX_FROM_ROWS:
+            # The chunk tasks index the rows they parsed themselves
+            chains = ((i, chunk.clone(kwargs={"index": True})) for i, chunk in chunks)
+        else:
+            chains = (
+                (i, chunk | index_chunk.s(job_id=job_id, chunk_index=i)) for i, chunk in chunks
+            )
+
+        dispatch_chains(job_id, chains)
+        if file_processor.compression:
+            JobProgress.set_total_bytes(job_id, file_processor.bytes_read)
 
     except ProcessingJob.DoesNotExist:
         logger.error(f"Processing job {job_id} not found")
@@ -46,12 +165,76 @@ def process_csv(job_id: int) -> None:
         handle_processing_error(job_id, e)
 
 
+def dispatch_chains(job_id: int, chains: Iterable[tuple[int, Signature]]) -> None:
+    JobTracker.start(job_id)
+    JobCheckpoints.reset_total(job_id)
+    # The file is still read from the start, but completed chunks are never dispatched again
+    checkpoints = JobCheckpoints.get(job_id)
+    total = 0
+
+    while window := list(islice(chains, DISPATCH_WINDOW_SIZE)):
+        total += len(window)
+        window = [chain for i, chain in window if not JobCheckpoints.is_set(checkpoints, i)]
+        if not window:
+            continue
+
+        # Backpressure: don't read further into the file until workers catch up.
+        # This blocks a worker slot, so workers need a concurrency above one. Failed
+        # chunks never release their slot, so a failed job must stop the wait too.
+        while True:
+            if ProcessingJob.objects.filter(id=job_id, status=ProcessingJob.Status.ERROR).exists():
+                logger.warning(f"Processing job {job_id} failed, stopping dispatch")
+                return
+            if JobTracker.in_flight(job_id) < MAX_CHUNKS_IN_FLIGHT:
+                break
+            time.sleep(DISPATCH_POLL_INTERVAL)
+
+        JobTracker.add(job_id, len(window))
+        group(*[chain.on_error(handle_error.s(job_id)) for chain in window]).delay()
+        JobProgress.add(job_id, chunks_dispatched=len(window))
+
+    JobTracker.done(job_id)
+    JobCheckpoints.set_total(job_id, total)
+    if JobCheckpoints.finish(job_id):
+        handle_results.delay([], job_id)
+
+
+def to_int(value: str) -> int | None:
+    return int(value) if value else None
+
+
+def get_content_hash(org: Organization) -> str:
+    # Built from the fields that are indexed, so it's the same whether the organization
+    # was parsed from a row or loaded from Postgres
+    return hash_content(
+        [
+            org.organization_id,
+            org.name,
+            org.website,
+            org.country.name,
+            org.description,
+            org.founded,
+            org.industry.type,
+            org.number_of_employees,
+        ]
+    )
+
+
+def hash_content(values: Iterable[Any]) -> str:
+    # Keep in sync with ChunkProcessor.copy_rows, Postgres hashes Parquet rows the same way
+    content = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.md5(content.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
 def handle_processing_error(job_id: int, error: Exception) -> None:
     logger.error(f"Error processing job {job_id}: {str(error)}")
     processing_job = ProcessingJob.objects.get(id=job_id)
     processing_job.status = ProcessingJob.Status.ERROR
     processing_job.error_message = str(error)
+    JobProgress.flush(processing_job)
     processing_job.save()
+    if processing_job.bulk_load:
+        end_bulk_load(job_id)
     raise error
 
 
@@ -59,10 +242,44 @@ class FileProcessor:
     def __init__(self, file: File, chunk_size: int = CHUNK_SIZE):
         self.file = file
         self.chunk_size = chunk_size
+        self.compression = FileProcessor.get_compression(file)
+        self.is_parquet = FileProcessor.get_magic_number(file) == PARQUET_MAGIC_NUMBER
+        self.bytes_read = 0
+
+    @staticmethod
+    def get_magic_number(file: File) -> bytes:
+        # Reading a MinIO file object downloads the whole object, a ranged read only fetches
+        # the bytes asked for
+        if isinstance(getattr(file, "storage", None), MinioStorage):
+            return FileProcessor.read_range(file, 0, 4)
+        file.seek(0)
+        magic = file.read(4)
+        file.seek(0)
+        return magic
+
+    @staticmethod
+    def get_compression(file: File) -> str | None:
+        magic = FileProcessor.get_magic_number(file)
+        for compression, magic_number in COMPRESSION_MAGIC_NUMBERS.items():
+            if magic.startswith(magic_number):
+                return compression
+        return None
+
+    def get_rows(self) -> Iterable[bytes]:
+        # The decompressors read the file in small blocks, memory doesn't grow with its size
+        if self.compression == "gzip":
+            return gzip.GzipFile(fileobj=self.file, mode="rb")
+        if self.compression == "bz2":
+            return bz2.BZ2File(self.file)
+        if self.compression == "zstd":
+            reader = zstandard.ZstdDecompressor().stream_reader(self.file, read_across_frames=True)
+            return io.BufferedReader(reader)
+        return self.file
 
     def get_chunks(self) -> Generator[list[str], None, None]:
         chunk = []
-        for row in self.file:
+        for row in self.get_rows():
+            self.bytes_read += len(row)
             chunk.append(row.decode("utf-8"))
             if len(chunk) >= self.chunk_size:
                 yield chunk
@@ -73,6 +290,124 @@ class FileProcessor:
 
         self.file.close()
 
+    def get_byte_ranges(self) -> Generator[tuple[int, int], None, None]:
+        start = end = 0
+        rows = 0
+        for row in self.file:
+            end += len(row)
+            rows += 1
+            if rows >= self.chunk_size:
+                yield start, end
+                start, rows = end, 0
+
+        if rows:
+            yield start, end
+
+        self.file.close()
+
+    @staticmethod
+    def read_range(file: File, start: int, end: int) -> bytes:
+        storage = getattr(file, "storage", None)
+        if isinstance(storage, MinioStorage):
+            response = storage.client.get_object(
+                storage.bucket_name, file.name, offset=start, length=end - start
+            )
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+
+        with file.open("rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    @staticmethod
+    def get_chunk_from_range(file: File, start: int, end: int) -> list[str]:
+        data = FileProcessor.read_range(file, start, end)
+        return [row.decode("utf-8") for row in data.splitlines(keepends=True)]
+
+    def get_record_batches(
+        self, batch_size: int = PARQUET_BATCH_SIZE
+    ) -> Generator[tuple[str, int], None, None]:
+        # Only the footer and the column chunks of the needed columns are fetched, one row
+        # group at a time
+        parquet_file = pq.ParquetFile(RangeFile(self.file))
+        missing = PARQUET_COLUMNS.keys() - set(parquet_file.schema_arrow.names)
+        if missing:
+            raise CSVReadingError(f"Missing columns: {', '.join(sorted(missing))}")
+
+        rows = batch_size
+        for row_group in range(parquet_file.num_row_groups):
+            metadata = parquet_file.metadata.row_group(row_group)
+            # Each batch weighs its share of the row group in the file, for the job progress
+            size = sum(
+                metadata.column(i).total_compressed_size for i in range(metadata.num_columns)
+            )
+            for batch in parquet_file.iter_batches(
+                batch_size=batch_size, row_groups=[row_group], columns=list(PARQUET_COLUMNS)
+            ):
+                batch = batch.rename_columns(list(PARQUET_COLUMNS.values()))
+                offset = 0
+                while offset < batch.num_rows:
+                    piece = batch.slice(offset, rows)
+                    data = FileProcessor.encode_record_batch(piece)
+                    if len(data) > PARQUET_MAX_MESSAGE_BYTES and piece.num_rows > 1:
+                        # Too big for a message, this and the next batches are cut smaller
+                        rows = piece.num_rows * PARQUET_MAX_MESSAGE_BYTES * 9 // (len(data) * 10)
+                        rows = max(rows, 1)
+                        continue
+                    offset += piece.num_rows
+                    yield data, size * piece.num_rows // max(metadata.num_rows, 1)
+
+    @staticmethod
+    def encode_record_batch(batch: pa.RecordBatch) -> str:
+        # Arrow IPC keeps the columns as they are, no Python object is built per value.
+        # The task payload is JSON, hence base64.
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_stream(sink, batch.schema, options=options) as writer:
+            writer.write_batch(batch)
+        return base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+
+    @staticmethod
+    def decode_record_batch(data: str) -> pa.Table:
+        return pa.ipc.open_stream(base64.b64decode(data)).read_all()
+
+
+class RangeFile(io.RawIOBase):
+    # Seekable view of a stored file that reads only the ranges asked for
+    def __init__(self, file: File):
+        self.file = file
+        self.size = file.size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        data = FileProcessor.read_range(self.file, self.position, end)
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
 
 class ChunkProcessor:
     @staticmethod
@@ -81,68 +416,626 @@ class ChunkProcessor:
         max_retries=3,
         default_retry_delay=30,
         acks_late=True,
+        ignore_result=True,
         name="process_chunk",
     )
-    def process_chunk(self, chunk: list[str]) -> list[int]:
+    def process_chunk(
+        self,
+        chunk: list[str],
+        engine: str = ProcessingJob.Engine.ORM,
+        job_id: int | None = None,
+        index: bool = False,
+        chunk_index: int | None = None,
+    ) -> list[int]:
         try:
-            organizations = Organization.objects.bulk_create(
-                ChunkProcessor.get_organizations_from_chunk(chunk),
-                unique_fields=["organization_id"],
-                update_conflicts=True,
-                update_fields=[
-                    "name",
-                    "website",
-                    "country_id",
-                    "description",
-                    "founded",
-                    "industry_id",
-                    "number_of_employees",
-                ],
-            )
+            if JobCheckpoints.is_done(job_id, chunk_index):
+                return []
+            organizations = ChunkProcessor.save_organizations(chunk, engine, job_id)
+            if index:
+                index_organizations(organizations)
+                complete_chunk(job_id, chunk_index)
             return [org.id for org in organizations]
         except Exception as exc:
             logger.exception("Failed to save organizations")
             raise self.retry(exc=exc)
 
     @staticmethod
-    def get_organizations_from_chunk(chunk: list[str]) -> list[Organization]:
-        csv_reader = csv.reader(chunk)
+    @shared_task(
+        bind=True,
+        max_retries=3,
+        default_retry_delay=30,
+        acks_late=True,
+        ignore_result=True,
+        name="process_chunk_range",
+    )
+    def process_chunk_range(
+        self,
+        job_id: int,
+        start: int,
+        end: int,
+        index: bool = False,
+        chunk_index: int | None = None,
+    ) -> list[int]:
+        try:
+            if JobCheckpoints.is_done(job_id, chunk_index):
+                return []
+            processing_job = ProcessingJob.objects.get(id=job_id)
+            chunk = FileProcessor.get_chunk_from_range(processing_job.file, start, end)
+            organizations = ChunkProcessor.save_organizations(chunk, processing_job.engine, job_id)
+            if index:
+                index_organizations(organizations)
+                complete_chunk(job_id, chunk_index)
+            return [org.id for org in organizations]
+        except Exception as exc:
+            logger.exception(f"Failed to save organizations from bytes {start}-{end}")
+            raise self.retry(exc=exc) from exc
+
+    @staticmethod
+    @shared_task(
+        bind=True,
+        max_retries=3,
+        default_retry_delay=30,
+        acks_late=True,
+        ignore_result=True,
+        name="process_record_batch",
+    )
+    def process_record_batch(
+        self,
+        batch: str,
+        job_id: int | None = None,
+        size: int = 0,
+        index: bool = False,
+        chunk_index: int | None = None,
+    ) -> list[int]:
+        try:
+            if JobCheckpoints.is_done(job_id, chunk_index):
+                return []
+            table = FileProcessor.decode_record_batch(batch)
+            table = ChunkProcessor.save_table(table, job_id, size)
+            if index:
+                index_organizations(ChunkProcessor.get_organizations_from_table(table))
+                complete_chunk(job_id, chunk_index)
+            return table["id"].to_pylist()
+        except Exception as exc:
+            logger.exception("Failed to save organizations from record batch")
+            raise self.retry(exc=exc) from exc
+
+    @staticmethod
+    def save_table(table: pa.Table, job_id: int | None = None, size: int = 0) -> pa.Table:
+        # Parquet rows are upserted with COPY whatever the job's engine, bulk_create would
+        # need a model instance per row
+        table, rejected = ChunkProcessor.parse_table(table)
+        accepted = table.num_rows
+        # Postgres skips the rows that are unchanged, only the ones written are kept
+        ids = ChunkProcessor.copy_table(table)
+        ids = pa.table(
+            {
+                "organization_id": pa.array(ids.keys(), pa.string()),
+                "id": pa.array(ids.values(), pa.int64()),
+            }
+        )
+        table = table.join(ids, "organization_id", join_type="inner")
+
+        if job_id is not None:
+            JobProgress.add(
+                job_id,
+                chunks_parsed=1,
+                rows_accepted=accepted,
+                rows_rejected=rejected,
+                rows_unchanged=accepted - table.num_rows,
+                bytes_read=size,
+            )
+        return table
+
+    @staticmethod
+    def parse_table(table: pa.Table) -> tuple[pa.Table, int]:
+        # Every check runs over whole columns, rows with a missing or malformed value are
+        # rejected like CSV rows with a wrong number of columns
+        columns = {
+            name: table[name].combine_chunks().cast(pa.string())
+            for name in ["organization_id", "name", "website", "country", "description", "industry"]
+        }
+        founded, founded_valid = ChunkProcessor.to_int_array(table["founded"].combine_chunks())
+        raw_employees = table["number_of_employees"].combine_chunks()
+        employees, employees_valid = ChunkProcessor.to_int_array(raw_employees)
+
+        valid = pc.and_(founded_valid, pc.fill_null(pc.greater_equal(founded, 0), False))
+        valid = pc.and_(valid, pc.fill_null(ChunkProcessor.is_in_range(founded), False))
+        valid = pc.and_(valid, pc.or_(employees_valid, ChunkProcessor.is_blank(raw_employees)))
+        valid = pc.and_(valid, pc.fill_null(ChunkProcessor.is_in_range(employees), True))
+        for name in ["organization_id", "name", "country", "industry"]:
+            valid = pc.and_(valid, pc.invert(ChunkProcessor.is_blank(columns[name])))
+        for name, max_length in MAX_LENGTHS.items():
+            fits = pc.less_equal(pc.utf8_length(columns[name]), max_length)
+            valid = pc.and_(valid, pc.fill_null(fits, True))
+
+        table = pa.table({**columns, "founded": founded, "number_of_employees": employees})
+        table = table.filter(valid)
+        table = table.append_column(
+            "country_id", ChunkProcessor.get_reference_ids(table["country"], Country, "name")
+        )
+        table = table.append_column(
+            "industry_id", ChunkProcessor.get_reference_ids(table["industry"], Industry, "type")
+        )
+        return table, len(valid) - table.num_rows
+
+    @staticmethod
+    def to_int_array(column: pa.Array) -> tuple[pa.Array, pa.Array]:
+        # Integers may come as integers, as strings or as floats (e.g. from pandas, which
+        # stores integer columns with missing values as floats)
+        if pa.types.is_integer(column.type):
+            values = column.cast(pa.int64())
+            return values, values.is_valid()
+        if pa.types.is_floating(column.type):
+            is_int = pc.and_(pc.equal(pc.floor(column), column), pc.less(pc.abs(column), 1e18))
+            is_int = pc.fill_null(is_int, False)
+        else:
+            column = pc.utf8_trim_whitespace(column.cast(pa.string()))
+            is_int = pc.fill_null(pc.match_substring_regex(column, r"^-?\d{1,18}$"), False)
+        values = pc.if_else(is_int, column, pa.scalar(None, column.type)).cast(pa.int64())
+        return values, is_int
+
+    @staticmethod
+    def is_in_range(values: pa.Array) -> pa.Array:
+        return pc.and_(
+            pc.greater_equal(values, INTEGER_RANGE[0]), pc.less_equal(values, INTEGER_RANGE[1])
+        )
+
+    @staticmethod
+    def is_blank(column: pa.Array) -> pa.Array:
+        if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            return column.is_null()
+        return pc.fill_null(pc.equal(pc.utf8_length(column), 0), True)
+
+    @staticmethod
+    def get_reference_ids(column: pa.ChunkedArray, model, field: str) -> pa.Array:
+        # Countries and industries are resolved once per distinct name, then taken by index
+        encoded = pc.dictionary_encode(column.combine_chunks())
+        names = encoded.dictionary.to_pylist()
+        ids = CacheManager.get_many_ids(model, field, set(names))
+        return pc.take(pa.array([ids[name] for name in names], pa.int64()), encoded.indices)
+
+    @staticmethod
+    def copy_table(table: pa.Table) -> dict[str, int]:
+        if not table.num_rows:
+            return {}
+        buffer = io.BytesIO()
+        pa_csv.write_csv(
+            table.select(["organization_id", *UPSERT_FIELDS]),
+            buffer,
+            pa_csv.WriteOptions(include_header=False),
+        )
+        buffer.seek(0)
+        return ChunkProcessor.copy_rows(buffer, changed_only=True)
+
+    @staticmethod
+    def get_organizations_from_table(table: pa.Table) -> list[Organization]:
+        # Only the rows that changed are turned into instances, to be indexed
+        countries, industries = {}, {}
+        organizations = []
+        for row in table.to_pylist():
+            country = countries.setdefault(
+                row["country"], Country(id=row["country_id"], name=row["country"])
+            )
+            industry = industries.setdefault(
+                row["industry"], Industry(id=row["industry_id"], type=row["industry"])
+            )
+            organizations.append(
+                Organization(
+                    id=row["id"],
+                    organization_id=row["organization_id"],
+                    name=row["name"],
+                    website=row["website"],
+                    country=country,
+                    description=row["description"],
+                    founded=row["founded"],
+                    industry=industry,
+                    number_of_employees=row["number_of_employees"],
+                )
+            )
+        return organizations
+
+    @staticmethod
+    def save_organizations(
+        chunk: list[str], engine: str = ProcessingJob.Engine.ORM, job_id: int | None = None
+    ) -> list[Organization]:
+        rows, rejected = ChunkProcessor.parse_rows(chunk)
+        organizations = ChunkProcessor.get_organizations_from_rows(rows)
+        logger.debug(f"Reference data cache stats: {CacheManager.get_stats()}")
+        organizations = ChunkProcessor.get_changed_organizations(organizations)
+
+        if engine == ProcessingJob.Engine.COPY:
+            organizations = ChunkProcessor.copy_organizations(organizations)
+        else:
+            organizations = Organization.objects.bulk_create(
+                organizations,
+                unique_fields=["organization_id"],
+                update_conflicts=True,
+                update_fields=UPSERT_FIELDS,
+            )
+
+        if job_id is not None:
+            JobProgress.add(
+                job_id,
+                chunks_parsed=1,
+                rows_accepted=len(rows),
+                rows_rejected=rejected,
+                rows_unchanged=len(rows) - len(organizations),
+                bytes_read=sum(len(row.encode("utf-8")) for row in chunk),
+            )
+        return organizations
+
+    @staticmethod
+    def get_changed_organizations(organizations: list[Organization]) -> list[Organization]:
+        # One indexed lookup per chunk. Rows whose content was already indexed are neither
+        # written to Postgres nor sent to Elasticsearch again.
+        hashes = dict(
+            Organization.objects.filter(
+                organization_id__in=[org.organization_id for org in organizations]
+            ).values_list("organization_id", "content_hash")
+        )
+        return [
+            org for org in organizations if hashes.get(org.organization_id) != get_content_hash(org)
+        ]
+
+    @staticmethod
+    def copy_organizations(organizations: list[Organization]) -> list[Organization]:
+        columns = ["organization_id", *UPSERT_FIELDS]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for org in organizations:
+            writer.writerow([getattr(org, column) for column in columns])
+        buffer.seek(0)
+
+        ids = ChunkProcessor.copy_rows(buffer)
+        for org in organizations:
+            org.id = ids[org.organization_id]
+        return organizations
+
+    @staticmethod
+    def copy_rows(buffer: io.IOBase, changed_only: bool = False) -> dict[str, int]:
+        columns = ["organization_id", *UPSERT_FIELDS]
+        table = Organization._meta.db_table
+        staging_table = f"{table}_staging"
+        column_list = ", ".join(columns)
+        staging_columns = ", ".join(f"s.{column}" for column in columns)
+        updates = ", ".join(f"{field} = EXCLUDED.{field}" for field in UPSERT_FIELDS)
+        changes = ""
+        if changed_only:
+            # Same content as hash_content, rows whose content was indexed already are skipped
+            content = " || chr(31) || ".join(
+                [
+                    "s.organization_id",
+                    "s.name",
+                    "coalesce(s.website, '')",
+                    "c.name",
+                    "coalesce(s.description, '')",
+                    "s.founded::text",
+                    "i.type",
+                    "coalesce(s.number_of_employees::text, '')",
+                ]
+            )
+            changes = f"""
+                JOIN {Country._meta.db_table} c ON c.id = s.country_id
+                JOIN {Industry._meta.db_table} i ON i.id = s.industry_id
+                LEFT JOIN {table} o ON o.organization_id = s.organization_id
+                WHERE o.content_hash IS DISTINCT FROM md5({content})
+            """
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Temporary tables are unlogged and private to the session, so concurrent
+            # workers never see each other's rows
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} (
+                    organization_id varchar(30),
+                    name varchar(255),
+                    website varchar(200),
+                    country_id bigint,
+                    description text,
+                    founded integer,
+                    industry_id bigint,
+                    number_of_employees integer
+                ) ON COMMIT DELETE ROWS
+                """
+            )
+            # Rows are only dropped on commit, clear leftovers when nested in a transaction
+            cursor.execute(f"TRUNCATE {staging_table}")
+            cursor.copy_expert(
+                f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({column_list})
+                SELECT DISTINCT ON (s.organization_id) {staging_columns}
+                FROM {staging_table} s {changes}
+                ORDER BY s.organization_id
+                ON CONFLICT (organization_id) DO UPDATE SET {updates}
+                RETURNING organization_id, id
+                """
+            )
+            return dict(cursor.fetchall())
+
+    @staticmethod
+    def parse_rows(chunk: list[str]) -> tuple[list[list[str]], int]:
+        # Blank lines and the header are skipped, rows with a wrong number of columns rejected
+        rows = [row for row in csv.reader(chunk) if row and row[0] != "Index"]
+        valid_rows = [row for row in rows if len(row) == 9]
+        return valid_rows, len(rows) - len(valid_rows)
+
+    @staticmethod
+    def get_organizations_from_rows(rows: list[list[str]]) -> list[Organization]:
+        # Resolve every distinct country and industry of the chunk at once. One instance
+        # per name is shared by its rows, so indexing never has to load the relations.
+        country_ids = CacheManager.get_many_ids(Country, "name", {row[4] for row in rows})
+        industry_ids = CacheManager.get_many_ids(Industry, "type", {row[7] for row in rows})
+        countries = {name: Country(id=pk, name=name) for name, pk in country_ids.items()}
+        industries = {name: Industry(id=pk, type=name) for name, pk in industry_ids.items()}
+
         return [
-            ChunkProcessor.get_organization_from_row(row)
-            for row in csv_reader
-            if len(row) == 9 and row[0] != "Index"
+            ChunkProcessor.get_organization_from_row(row, countries, industries) for row in rows
         ]
 
     @staticmethod
-    def get_organization_from_row(row: list[str]) -> Organization:
+    def get_organization_from_row(
+        row: list[str], countries: dict[str, Country], industries: dict[str, Industry]
+    ) -> Organization:
         return Organization(
             organization_id=row[1],
             name=row[2],
             website=row[3],
-            country=ChunkProcessor.get_or_create_country(row[4]),
+            country=countries[row[4]],
             description=row[5],
-            founded=row[6],
-            industry=ChunkProcessor.get_or_create_industry(row[7]),
-            number_of_employees=row[8],
+            founded=to_int(row[6]),
+            industry=industries[row[7]],
+            number_of_employees=to_int(row[8]),
         )
 
+
+class CacheManager:
+    GENERATION_KEY = "reference_data_generation"
+    # How often (in seconds) a process checks Redis for a newer generation
+    GENERATION_CHECK_INTERVAL = 30
+
+    # First tier, private to the process. Only stores primary keys keyed by name.
+    local_cache = LRUCache(max_size=10_000)
+    generation = 0
+    generation_checked_at = 0.0
+    stats = Counter()
+
+    @staticmethod
+    def get_many_ids(model, field: str, values: set[str]) -> dict[str, int]:
+        generation = CacheManager.get_generation()
+        prefix = f"{model._meta.model_name}_id_{generation}"
+
+        ids = {}
+        for value in values:
+            pk = CacheManager.local_cache.get(f"{prefix}_{value}")
+            if pk is not None:
+                ids[value] = pk
+        CacheManager.stats["local_hits"] += len(ids)
+
+        remaining = values - ids.keys()
+        if remaining:
+            cached = cache.get_many([f"{prefix}_{value}" for value in remaining])
+            CacheManager.stats["redis_hits"] += len(cached)
+            for key, pk in cached.items():
+                CacheManager.local_cache.set(key, pk)
+                ids[key.removeprefix(f"{prefix}_")] = pk
+
+        missing = values - ids.keys()
+        if missing:
+            CacheManager.stats["misses"] += len(missing)
+            model.objects.bulk_create(
+                [model(**{field: value}) for value in missing], ignore_conflicts=True
+            )
+            created = {
+                f"{prefix}_{value}": pk
+                for value, pk in model.objects.filter(**{f"{field}__in": missing}).values_list(
+                    field, "pk"
+                )
+            }
+            cache.set_many(created, timeout=3600)
+            for key, pk in created.items():
+                CacheManager.local_cache.set(key, pk)
+                ids[key.removeprefix(f"{prefix}_")] = pk
+
+        return ids
+
     @staticmethod
-    def get_or_create_country(country_name: str) -> Country:
-        return CacheManager.get_or_create(Country, f"country_{country_name}", name=country_name)
+    def get_generation() -> int:
+        now = time.monotonic()
+        if now - CacheManager.generation_checked_at > CacheManager.GENERATION_CHECK_INTERVAL:
+            cache.add(CacheManager.GENERATION_KEY, 0, timeout=None)
+            generation = cache.get(CacheManager.GENERATION_KEY, 0)
+            if generation != CacheManager.generation:
+                CacheManager.local_cache.clear()
+                CacheManager.generation = generation
+            CacheManager.generation_checked_at = now
+        return CacheManager.generation
 
     @staticmethod
-    def get_or_create_industry(industry_type: str) -> Industry:
-        return CacheManager.get_or_create(Industry, f"industry_{industry_type}", type=industry_type)
+    def invalidate() -> None:
+        # Other processes drop their local entries on their next generation check
+        cache.add(CacheManager.GENERATION_KEY, 0, timeout=None)
+        cache.incr(CacheManager.GENERATION_KEY)
+        CacheManager.clear_local()
 
+    @staticmethod
+    def clear_local() -> None:
+        CacheManager.local_cache.clear()
+        CacheManager.generation_checked_at = 0.0
+
+    @staticmethod
+    def get_stats() -> dict[str, float]:
+        hits = CacheManager.stats["local_hits"] + CacheManager.stats["redis_hits"]
+        total = hits + CacheManager.stats["misses"]
+        return {
+            "local_hits": CacheManager.stats["local_hits"],
+            "redis_hits": CacheManager.stats["redis_hits"],
+            "misses": CacheManager.stats["misses"],
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+class JobTracker:
+    TIMEOUT = 60 * 60 * 24
+
+    @staticmethod
+    def get_key(job_id: int) -> str:
+        return f"processing_job_{job_id}_pending"
+
+    @staticmethod
+    def start(job_id: int) -> None:
+        # The dispatcher holds one extra token until every chunk has been submitted,
+        # so the job can't be marked as finished while chunks are still being read
+        cache.set(JobTracker.get_key(job_id), 1, timeout=JobTracker.TIMEOUT)
+
+    @staticmethod
+    def add(job_id: int, count: int) -> int:
+        return cache.incr(JobTracker.get_key(job_id), count)
+
+    @staticmethod
+    def done(job_id: int, count: int = 1) -> bool:
+        return cache.decr(JobTracker.get_key(job_id), count) == 0
+
+    @staticmethod
+    def in_flight(job_id: int) -> int:
+        return max(cache.get(JobTracker.get_key(job_id), 1) - 1, 0)
+
+
+class JobProgress:
+    TIMEOUT = 60 * 60 * 24
+    COUNTERS = [
+        "chunks_dispatched",
+        "chunks_parsed",
+        "chunks_indexed",
+        "rows_accepted",
+        "rows_rejected",
+        "rows_unchanged",
+        "bytes_read",
+    ]
+
+    @staticmethod
+    def get_key(job_id: int, name: str) -> str:
+        return f"processing_job_{job_id}_{name}"
+
+    @staticmethod
+    def start(
+        job_id: int,
+        total_bytes: int,
+        started_at: datetime | None = None,
+        progress: dict[str, int] | None = None,
+    ) -> None:
+        progress = progress or {}
+        values = {"started_at": started_at or timezone.now(), "total_bytes": total_bytes}
+        values.update({name: progress.get(name, 0) for name in JobProgress.COUNTERS})
+        # Counters still in Redis belong to a run of the same job that was interrupted
+        for name, value in values.items():
+            cache.add(JobProgress.get_key(job_id, name), value, timeout=JobProgress.TIMEOUT)
+
+    @staticmethod
+    def set_total_bytes(job_id: int, total_bytes: int) -> None:
+        cache.set(JobProgress.get_key(job_id, "total_bytes"), total_bytes, JobProgress.TIMEOUT)
+
+    @staticmethod
+    def add(job_id: int, **counts: int) -> None:
+        # Atomic increments, workers never read-modify-write the counters
+        for name, count in counts.items():
+            if count:
+                increment_counter(
+                    JobProgress.get_key(job_id, name), count, timeout=JobProgress.TIMEOUT
+                )
+
+    @staticmethod
+    def get(job_id: int) -> dict[str, Any] | None:
+        names = ["started_at", "total_bytes", *JobProgress.COUNTERS]
+        values = cache.get_many([JobProgress.get_key(job_id, name) for name in names])
+        if not values:
+            return None
+        return {name: values.get(JobProgress.get_key(job_id, name), 0) for name in names}
+
+    @staticmethod
+    def flush(processing_job: ProcessingJob) -> None:
+        # A job is only written to Postgres once it's over. Several error callbacks may
+        # finish the same job, only the first one finds the counters.
+        progress = JobProgress.get(processing_job.id)
+        if progress is None or not cache.delete(
+            JobProgress.get_key(processing_job.id, "started_at")
+        ):
+            return
+
+        processing_job.started_at = progress.pop("started_at")
+        processing_job.finished_at = timezone.now()
+        processing_job.progress = progress
+        cache.delete_many([JobProgress.get_key(processing_job.id, name) for name in progress])
+
+
+class JobCheckpoints:
+    # Kept for a week so a failed job can still be resumed after the weekend
+    TIMEOUT = 60 * 60 * 24 * 7
+
+    @staticmethod
+    def get_key(job_id: int) -> str:
+        return cache.make_key(f"processing_job_{job_id}_checkpoints")
+
+    @staticmethod
+    def mark_done(job_id: int, chunk_index: int) -> bool:
+        # One bit per chunk, a job of 100k chunks takes 12.5KB
+        key = JobCheckpoints.get_key(job_id)
+        pipeline = get_redis_client().pipeline()
+        pipeline.setbit(key, chunk_index, 1)
+        pipeline.expire(key, JobCheckpoints.TIMEOUT)
+        was_set, _ = pipeline.execute()
+        return not was_set
+
+    @staticmethod
+    def is_done(job_id: int | None, chunk_index: int | None) -> bool:
+        if job_id is None or chunk_index is None:
+            return False
+        return bool(get_redis_client().getbit(JobCheckpoints.get_key(job_id), chunk_index))
+
+    @staticmethod
+    def get(job_id: int) -> bytes:
+        return get_redis_client().get(JobCheckpoints.get_key(job_id)) or b""
+
+    @staticmethod
+    def get_total_key(job_id: int) -> str:
+        return f"processing_job_{job_id}_chunks"
+
+    @staticmethod
+    def set_total(job_id: int, total: int) -> None:
+        cache.set(JobCheckpoints.get_total_key(job_id), total, timeout=JobCheckpoints.TIMEOUT)
 
-class CacheManager:
     @staticmethod
-    def get_or_create(model, cache_key: str, **kwargs) -> Any:
-        item = cache.get(cache_key)
-        if not item:
-            item, _ = model.objects.get_or_create(**kwargs)
-            cache.set(cache_key, item, timeout=3600)
-        return item
+    def reset_total(job_id: int) -> None:
+        cache.delete(JobCheckpoints.get_total_key(job_id))
+
+    @staticmethod
+    def finish(job_id: int) -> bool:
+        # The number of chunks is only known once the dispatcher is through the file. Both
+        # the dispatcher and the last chunk may see every bit set, only one deletes the total.
+        total = cache.get(JobCheckpoints.get_total_key(job_id))
+        return (
+            total is not None
+            and JobCheckpoints.count(job_id) >= total
+            and cache.delete(JobCheckpoints.get_total_key(job_id))
+        )
+
+    @staticmethod
+    def is_set(checkpoints: bytes, chunk_index: int) -> bool:
+        # Redis numbers the bits of each byte from the most significant one
+        byte, bit = divmod(chunk_index, 8)
+        return byte < len(checkpoints) and bool(checkpoints[byte] & (0x80 >> bit))
+
+    @staticmethod
+    def count(job_id: int) -> int:
+        return get_redis_client().bitcount(JobCheckpoints.get_key(job_id))
+
+    @staticmethod
+    def delete(job_id: int) -> None:
+        get_redis_client().delete(JobCheckpoints.get_key(job_id))
 
 
 @shared_task(
@@ -150,50 +1043,85 @@ class CacheManager:
     max_retries=3,
     default_retry_delay=30,
     acks_late=True,
+    ignore_result=True,
     name="index_organizations",
 )
-def index_chunk(self, organization_ids: list[int]) -> int:
+def index_chunk(
+    self, organization_ids: list[int], job_id: int | None = None, chunk_index: int | None = None
+) -> int:
     try:
-        client = connections.get_connection()
-        organizations = Organization.objects.filter(id__in=organization_ids)
-
-        actions = [
-            {
-                "_index": OrganizationDocument._index._name,
-                "_id": org.organization_id,
-                "_source": {
-                    "id": org.id,
-                    "organization_id": org.organization_id,
-                    "name": org.name,
-                    "website": org.website,
-                    "country": org.country.name,
-                    "description": org.description,
-                    "founded": org.founded,
-                    "industry": org.industry.type,
-                    "number_of_employees": org.number_of_employees,
-                },
-                "doc_as_upsert": True,
-            }
-            for org in organizations
-        ]
-        _, failed = bulk(client, actions)
-
-        if failed:
-            logger.error(f"Failed to index organizations: {failed}")
-            raise IndexingError(f"Indexing failed for {len(failed)} organizations")
-
-        return organizations.count()
+        organizations = Organization.objects.filter(id__in=organization_ids).select_related(
+            "country", "industry"
+        )
+        indexed = index_organizations(organizations)
+        complete_chunk(job_id, chunk_index)
+        return indexed
 
     except Exception as exc:
         logger.exception("Error during organization indexing")
         raise self.retry(exc=exc)
 
 
+def index_organizations(organizations: Iterable[Organization]) -> int:
+    client = connections.get_connection()
+
+    organizations = list(organizations)
+    if not organizations:
+        return 0
+
+    try:
+        _, failed = bulk(
+            client, get_index_actions(organizations, get_write_indices()), raise_on_error=False
+        )
+    finally:
+        # Even a failed bulk request may have updated some of them. The generation is
+        # bumped first, so a cache read racing with this write doesn't keep what it read.
+        bump_index_generation()
+        DocumentCache.invalidate(org.organization_id for org in organizations)
+
+    if failed:
+        logger.error(f"Failed to index organizations: {failed}")
+        raise IndexingError(f"Indexing failed for {len(failed)} organizations")
+
+    # Only stored once the documents are indexed, a chunk that fails in between is
+    # written and indexed again when it's retried or resumed
+    for org in organizations:
+        org.content_hash = get_content_hash(org)
+    Organization.objects.bulk_update(organizations, ["content_hash"], batch_size=CHUNK_SIZE)
+    return len(organizations)
+
+
+def complete_chunk(job_id: int | None, chunk_index: int | None = None) -> None:
+    if job_id is None:
+        return
+    if chunk_index is None:
+        JobProgress.add(job_id, chunks_indexed=1)
+        # The chunk that brings the job's pending counter to zero finishes the job
+        if JobTracker.done(job_id):
+            handle_results.delay([], job_id)
+        return
+
+    # A redelivered chunk that already completed must not count twice
+    if not JobCheckpoints.mark_done(job_id, chunk_index):
+        return
+
+    JobProgress.add(job_id, chunks_indexed=1)
+    # The pending counter only paces the dispatcher, a redelivered dispatcher resets it
+    # while chunks are in flight. The checkpoints tell when every chunk is in.
+    JobTracker.done(job_id)
+    if JobCheckpoints.finish(job_id):
+        handle_results.delay([], job_id)
+
+
 @shared_task(bind=True, acks_late=True)
 def handle_results(self, results, job_id: int) -> None:
     processing_job = ProcessingJob.objects.get(id=job_id)
+    if processing_job.bulk_load:
+        end_bulk_load(job_id, refresh=True)
     processing_job.status = ProcessingJob.Status.SUCCESS
+    JobProgress.flush(processing_job)
     processing_job.save()
+    JobCheckpoints.delete(job_id)
     logger.info(f"Processing job {job_id} completed successfully")
 
 
@@ -203,4 +1131,7 @@ def handle_error(request, exc, traceback, job_id):
     processing_job = ProcessingJob.objects.get(id=job_id)
     processing_job.status = ProcessingJob.Status.ERROR
     processing_job.error_message = str(exc)
+    JobProgress.flush(processing_job)
     processing_job.save()
+    if processing_job.bulk_load:
+        end_bulk_load(job_id)
@@ -1,26 +1,65 @@
-from unittest.mock import MagicMock, patch
-
+import bz2
+import gzip
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+import zstandard
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
 from django.http import QueryDict
+from django.test import AsyncClient, override_settings
 from django.urls import reverse
+from elasticsearch.helpers import BulkIndexError
 from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
+from minio_storage.storage import MinioStorage
 from rest_framework import status
 from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APIRequestFactory
 
+from organizations.caches import DocumentCache, LRUCache, SingleFlight, bump_index_generation
 from organizations.documents import OrganizationDocument
+from organizations.indexes import (
+    BULK_LOAD_JOBS_KEY,
+    end_bulk_load,
+    get_id_ranges,
+    populate_index,
+    start_bulk_load,
+    swap_aliases,
+)
 from organizations.models import Country, Industry, Organization, ProcessingJob
 from organizations.paginators import ElasticsearchCursorPagination
-from organizations.services import build_organization_search_query, create_organization
+from organizations.renderers import ORJSONRenderer
+from organizations.serializers import OrganizationCreateSerializer
+from organizations.services import (
+    autocomplete_cache,
+    build_organization_facets_query,
+    build_organization_search_query,
+    create_organization,
+)
 from organizations.tasks import (
     CacheManager,
     ChunkProcessor,
     FileProcessor,
+    IndexingError,
+    JobCheckpoints,
+    JobProgress,
+    JobTracker,
+    complete_chunk,
     handle_error,
     handle_results,
     index_chunk,
+    index_organizations,
     process_csv,
 )
 
@@ -52,6 +91,19 @@ def api_client():
     return APIClient()
 
 
+@pytest.fixture
+def clear_cache():
+    cache.clear()
+    CacheManager.clear_local()
+    DocumentCache.local_cache.clear()
+    DocumentCache.stats.clear()
+    yield
+    cache.clear()
+    CacheManager.clear_local()
+    DocumentCache.local_cache.clear()
+    DocumentCache.stats.clear()
+
+
 @pytest.fixture
 def mock_process_csv():
     with patch("organizations.services.process_csv") as mock:
@@ -83,6 +135,17 @@ def test_upload_csv(api_client, mock_process_csv):
     mock_process_csv.delay.assert_called_once()
 
 
+@pytest.mark.django_db
+def test_upload_csv_with_copy_engine(api_client, mock_process_csv):
+    url = reverse("upload-csv")
+    file = SimpleUploadedFile("test.csv", b"Index,Organization Id\n", content_type="text/csv")
+
+    response = api_client.post(url, {"file": file, "engine": "COPY"}, format="multipart")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert ProcessingJob.objects.get().engine == ProcessingJob.Engine.COPY
+
+
 @pytest.mark.django_db
 def test_build_organization_search_query():
     query_params = {
@@ -103,7 +166,7 @@ def test_build_organization_search_query():
 
 
 @pytest.mark.django_db
-def test_organization_retrieve(api_client, mock_es):
+def test_organization_retrieve(api_client, mock_es, clear_cache):
     organization = Organization.objects.create(
         organization_id="org123",
         name="Test Org",
@@ -139,6 +202,323 @@ def test_organization_retrieve(api_client, mock_es):
     mock_es["get"].assert_called_once_with(id=organization.organization_id)
 
 
+def create_search_hit(organization_id):
+    return OrganizationDocument(
+        meta={"id": organization_id, "sort": [1.0, organization_id]},
+        organization_id=organization_id,
+        name="Test Org",
+        website="http://testorg.com",
+        country="USA",
+        description="A test organization",
+        founded=2000,
+        industry="Technology",
+        number_of_employees=100,
+    )
+
+
+def test_search_results_are_cached(api_client, mock_es, clear_cache):
+    mock_es["execute"].return_value = [create_search_hit("org123")]
+    url = reverse("organization-search")
+
+    first = api_client.get(url, {"q": "test", "country": "USA"})
+    # Same parameters in a different order, plus an empty one
+    second = api_client.get(url, {"country": "USA", "q": "test", "industry": ""})
+
+    assert first["X-Cache"] == "MISS"
+    assert second["X-Cache"] == "HIT"
+    assert second.data == first.data
+    mock_es["execute"].assert_called_once()
+
+    response = api_client.get(url, {"q": "test", "country": "USA"}, HTTP_CACHE_CONTROL="no-cache")
+    assert response["X-Cache"] == "MISS"
+    assert mock_es["execute"].call_count == 2
+
+    stats = api_client.get(reverse("organization-cache-stats")).data
+    assert stats["search"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_search_pit_pages_are_not_cached(api_client, mock_es, clear_cache):
+    response = MagicMock(pit_id="pit-1")
+    response.__iter__.return_value = iter([create_search_hit("org123")])
+    mock_es["execute"].return_value = response
+
+    with (
+        patch.object(ElasticsearchCursorPagination, "open_pit", return_value="pit-1"),
+        patch.object(ElasticsearchCursorPagination, "close_pit"),
+        patch("organizations.views.SearchCache.set") as mock_set,
+    ):
+        response = api_client.get(reverse("organization-search"), {"pit": "true"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["X-Cache"] == "MISS"
+    mock_set.assert_not_called()
+
+
+def test_search_sparse_fieldsets(api_client, mock_es, clear_cache):
+    mock_es["execute"].return_value = [create_search_hit("org123")]
+
+    response = api_client.get(reverse("organization-search"), {"fields": "name, country"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["results"] == [{"name": "Test Org", "country": "USA"}]
+
+    query = build_organization_search_query({"fields": "name,country"})
+    assert query.to_dict()["_source"] == {"includes": ["name", "country"]}
+    assert "hits.hits._source" in query._params["filter_path"]
+
+    response = api_client.get(reverse("organization-search"), {"fields": "name,secret"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_filtered_response_without_hits():
+    # filter_path leaves nothing of a search without results
+    response = build_organization_search_query({})._response_class(Search(), {})
+
+    assert list(response) == []
+
+
+@override_settings(SEARCH_FAST_READ_PATH=True)
+def test_search_fast_read_path(api_client, mock_es, clear_cache):
+    hits = [
+        {
+            "_id": f"org{i}",
+            "_source": create_search_hit(f"org{i}").to_dict(),
+            "sort": [1.0, f"org{i}"],
+        }
+        for i in range(3)
+    ]
+    mock_es["execute"].return_value = hits
+
+    response = api_client.get(reverse("organization-search"), {"page_size": 2})
+    sparse_response = api_client.get(reverse("organization-search"), {"fields": "name"})
+
+    assert response.status_code == status.HTTP_200_OK
+    # Same output as the serializer
+    assert response.data["results"] == [
+        OrganizationCreateSerializer(create_search_hit(f"org{i}")).data for i in range(2)
+    ]
+    assert response.data["next"] is not None
+    assert sparse_response.data["results"] == [{"name": "Test Org"}] * 3
+
+
+def test_orjson_renderer_matches_json_renderer():
+    data = {"next": None, "results": [{"name": "Café Ñandú", "founded": 1990, "website": None}]}
+
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_search_cache_invalidated_by_index_writes(api_client, mock_es, clear_cache):
+    mock_es["execute"].return_value = [create_search_hit("org123")]
+    url = reverse("organization-search")
+
+    api_client.get(url, {"q": "test"})
+    bump_index_generation()
+    response = api_client.get(url, {"q": "test"})
+
+    assert response["X-Cache"] == "MISS"
+    assert mock_es["execute"].call_count == 2
+
+
+def create_facets_response(query_params):
+    return Response(
+        build_organization_facets_query(query_params),
+        {
+            "hits": {"total": {"value": 3, "relation": "eq"}, "hits": []},
+            "aggregations": {
+                "country": {"buckets": [{"key": "USA", "doc_count": 3}]},
+                "industry": {"buckets": [{"key": "Technology", "doc_count": 3}]},
+                "founded": {
+                    "buckets": [{"key": 1990.0, "doc_count": 1}, {"key": 2000.0, "doc_count": 2}]
+                },
+            },
+        },
+    )
+
+
+def test_organization_facets(api_client, mock_es, clear_cache):
+    mock_es["execute"].return_value = create_facets_response({})
+    url = reverse("organization-search-facets")
+
+    first = api_client.get(url)
+    second = api_client.get(url)
+
+    assert first.data == {
+        "total": 3,
+        "country": [{"key": "USA", "count": 3}],
+        "industry": [{"key": "Technology", "count": 3}],
+        "founded": [{"key": 1990.0, "count": 1}, {"key": 2000.0, "count": 2}],
+    }
+    # Unfiltered facets are cached
+    assert second["X-Cache"] == "HIT"
+    mock_es["execute"].assert_called_once()
+
+    # Filtered facets are not
+    api_client.get(url, {"country": "USA"})
+    api_client.get(url, {"country": "USA"})
+    assert mock_es["execute"].call_count == 3
+
+
+def test_build_organization_facets_query():
+    query = build_organization_facets_query({"country": "USA", "founded_interval": "5"}).to_dict()
+
+    assert query["size"] == 0
+    assert "sort" not in query
+    assert query["aggs"]["country"]["terms"]["field"] == "country.keyword"
+    assert query["aggs"]["industry"]["terms"]["field"] == "industry.keyword"
+    assert query["aggs"]["founded"]["histogram"]["interval"] == 5
+
+
+def test_autocomplete(api_client):
+    autocomplete_cache.clear()
+    url = reverse("organization-autocomplete")
+
+    with patch("organizations.services.connections.get_connection") as mock_get_connection:
+        mock_search = mock_get_connection.return_value.search
+        mock_search.return_value = {
+            "hits": {"hits": [{"_source": {"organization_id": "org123", "name": "Acme Inc."}}]}
+        }
+        response = api_client.get(url, {"q": "Acme  In", "limit": 3})
+        # Same prefix, different spelling, served from the local cache
+        cached_response = api_client.get(url, {"q": "acme in ", "limit": 3})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == [{"organization_id": "org123", "name": "Acme Inc."}]
+    assert cached_response.data == response.data
+    mock_search.assert_called_once()
+    assert mock_search.call_args.kwargs["size"] == 3
+    assert mock_search.call_args.kwargs["source"] == ["organization_id", "name"]
+    assert mock_search.call_args.kwargs["query"]["multi_match"]["query"] == "acme in"
+
+
+def test_autocomplete_validation(api_client):
+    url = reverse("organization-autocomplete")
+
+    assert api_client.get(url).status_code == status.HTTP_400_BAD_REQUEST
+    assert api_client.get(url, {"q": "a", "limit": 50}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_organizations_batch(api_client):
+    url = reverse("organization-batch")
+
+    with patch("organizations.documents.OrganizationDocument.mget") as mock_mget:
+        mock_mget.return_value = [create_search_hit("org1"), None]
+        response = api_client.post(
+            url, {"organization_ids": ["org1", "org2", "org1"]}, format="json"
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [org["organization_id"] for org in response.data["found"]] == ["org1"]
+    assert response.data["missing"] == ["org2"]
+    # A single mget without duplicates
+    mock_mget.assert_called_once_with(["org1", "org2"], missing="none")
+
+
+def test_organizations_batch_limit(api_client):
+    url = reverse("organization-batch")
+
+    response = api_client.post(
+        url, {"organization_ids": [f"org{i}" for i in range(101)]}, format="json"
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_organization_retrieve_cached(api_client, mock_es, clear_cache):
+    mock_es["get"].return_value = create_search_hit("org123")
+    url = reverse("organization-get", kwargs={"organization_id": "org123"})
+
+    api_client.get(url)
+    response = api_client.get(url)
+    # Another process only finds the document in Redis
+    DocumentCache.local_cache.clear()
+    api_client.get(url)
+
+    assert response.data["organization_id"] == "org123"
+    mock_es["get"].assert_called_once()
+    stats = api_client.get(reverse("organization-cache-stats")).data["documents"]
+    assert stats == {"local_hits": 1, "redis_hits": 1, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_organization_retrieve_racing_with_index(api_client, mock_es, clear_cache):
+    def get_while_indexing(**kwargs):
+        # The document is indexed again while the old version is being read
+        bump_index_generation()
+        DocumentCache.invalidate(["org123"])
+        return create_search_hit("org123")
+
+    mock_es["get"].side_effect = get_while_indexing
+    url = reverse("organization-get", kwargs={"organization_id": "org123"})
+
+    response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert DocumentCache.get("org123") is None
+
+
+@pytest.mark.django_db
+def test_document_cache_invalidated_on_index(clear_cache):
+    DocumentCache.set("abc123", {"organization_id": "abc123", "name": "Old name"})
+    chunk = [
+        "Index,Organization Id,Name,Website,Country,Description,Founded,Industry,"
+        "Number of employees",
+        "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,"
+        "Manufacturing,1000",
+    ]
+    ids = ChunkProcessor.process_chunk(chunk)
+
+    with (
+        patch("organizations.tasks.bulk", return_value=(1, [])),
+        patch("organizations.tasks.get_write_indices", return_value=["organizations"]),
+    ):
+        index_chunk(ids)
+
+    assert DocumentCache.get("abc123") is None
+
+
+def bulk_with_one_failure(client, actions, raise_on_error=True, **kwargs):
+    actions = list(actions)
+    errors = [{"index": {"_id": actions[-1]["_id"], "status": 400}}]
+    if raise_on_error:
+        raise BulkIndexError("1 document(s) failed to index.", errors)
+    return len(actions) - 1, errors
+
+
+@pytest.mark.django_db
+def test_document_cache_invalidated_when_bulk_partially_fails(clear_cache):
+    chunk = [
+        "1,abc123,Acme Inc.,,United States,,1900,Software,1000",
+        "2,def456,Globex,,Spain,,1990,Software,",
+    ]
+    organizations = ChunkProcessor.save_organizations(chunk)
+    for organization in organizations:
+        DocumentCache.set(organization.organization_id, {"name": "Old name"})
+
+    with (
+        patch("organizations.tasks.bulk", side_effect=bulk_with_one_failure),
+        patch("organizations.tasks.get_write_indices", return_value=["organizations"]),
+        pytest.raises(IndexingError),
+    ):
+        index_organizations(organizations)
+
+    assert DocumentCache.get("abc123") is None
+    assert DocumentCache.get("def456") is None
+    # Nothing is taken as indexed, the chunk is indexed again when it's retried
+    assert set(Organization.objects.values_list("content_hash", flat=True)) == {""}
+
+    for organization in organizations:
+        DocumentCache.set(organization.organization_id, {"name": "Old name"})
+    with (
+        patch("django_elasticsearch_dsl.documents.bulk", side_effect=bulk_with_one_failure),
+        patch("organizations.indexes.get_write_indices", return_value=["organizations"]),
+        pytest.raises(BulkIndexError),
+    ):
+        OrganizationDocument().update(organizations)
+
+    assert DocumentCache.get("abc123") is None
+    assert DocumentCache.get("def456") is None
+
+
 @pytest.mark.django_db
 def test_organization_model():
     country = Country.objects.create(name="USA")
@@ -191,6 +571,116 @@ def test_handle_results():
     assert processing_job.status == ProcessingJob.Status.SUCCESS
 
 
+@pytest.mark.django_db
+def test_process_csv_dispatches_windows(clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    csv_content = b"".join(b"%d,row\n" % i for i in range(1001))
+
+    with (
+        patch("organizations.tasks.ProcessingJob.objects.get") as mock_get,
+        patch("organizations.tasks.DISPATCH_WINDOW_SIZE", 2),
+        patch("organizations.tasks.group") as mock_group,
+        patch("organizations.tasks.handle_results.delay") as mock_handle_results,
+    ):
+        mock_get.return_value = ProcessingJob(
+            id=processing_job.id, file=ContentFile(csv_content, name="test.csv")
+        )
+
+        process_csv(processing_job.id)
+
+    assert mock_group.call_count == 2
+    mock_handle_results.assert_not_called()
+    # Only the three dispatched chunks are left once the dispatcher releases its token
+    assert JobTracker.done(processing_job.id, 3)
+
+
+@pytest.mark.django_db
+def test_process_csv_stops_waiting_when_job_fails(clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    csv_content = b"".join(b"%d,row\n" % i for i in range(1001))
+
+    def fail_job(seconds):
+        ProcessingJob.objects.filter(id=processing_job.id).update(status=ProcessingJob.Status.ERROR)
+
+    with (
+        patch("organizations.tasks.ProcessingJob.objects.get") as mock_get,
+        patch("organizations.tasks.DISPATCH_WINDOW_SIZE", 1),
+        patch("organizations.tasks.MAX_CHUNKS_IN_FLIGHT", 1),
+        patch("organizations.tasks.group") as mock_group,
+        patch("organizations.tasks.time.sleep", side_effect=fail_job) as mock_sleep,
+    ):
+        mock_get.return_value = ProcessingJob(
+            id=processing_job.id, file=ContentFile(csv_content, name="test.csv")
+        )
+
+        process_csv(processing_job.id)
+
+    # The first chunk fills the window and never completes, the failure ends the wait
+    assert mock_group.call_count == 1
+    mock_sleep.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_process_csv_resumes_from_checkpoints(clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    csv_content = b"".join(b"%d,row\n" % i for i in range(1001))
+    JobCheckpoints.mark_done(processing_job.id, 0)
+    JobCheckpoints.mark_done(processing_job.id, 2)
+
+    with (
+        patch("organizations.tasks.ProcessingJob.objects.get") as mock_get,
+        patch("organizations.tasks.group") as mock_group,
+        patch("organizations.tasks.handle_results.delay") as mock_handle_results,
+    ):
+        mock_get.return_value = ProcessingJob(
+            id=processing_job.id, file=ContentFile(csv_content, name="test.csv")
+        )
+
+        process_csv(processing_job.id)
+        # Only the chunk without a checkpoint is dispatched again
+        (chain,), _ = mock_group.call_args
+        assert chain.tasks[-1].kwargs["chunk_index"] == 1
+        mock_handle_results.assert_not_called()
+
+        complete_chunk(processing_job.id, 1)
+        # A redelivered chunk neither counts again nor finishes the job twice
+        complete_chunk(processing_job.id, 1)
+        mock_handle_results.assert_called_once_with([], processing_job.id)
+
+
+@pytest.mark.django_db
+def test_resume_processing_job_command(clear_cache):
+    processing_job = ProcessingJob.objects.create(
+        file=None, status=ProcessingJob.Status.ERROR, error_message="Worker lost"
+    )
+
+    with patch("organizations.services.process_csv.delay") as mock_process_csv:
+        call_command("resume_processing_job", processing_job.id, stdout=io.StringIO())
+        mock_process_csv.assert_called_once_with(processing_job.id)
+
+        with pytest.raises(CommandError):
+            call_command("resume_processing_job", processing_job.id)
+
+    processing_job.refresh_from_db()
+    assert processing_job.status == ProcessingJob.Status.PENDING
+    assert processing_job.error_message is None
+
+
+@pytest.mark.django_db
+def test_index_chunk_completes_job(clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    JobTracker.start(processing_job.id)
+    JobTracker.add(processing_job.id, 2)
+    JobTracker.done(processing_job.id)
+
+    with patch("organizations.tasks.handle_results.delay") as mock_handle_results:
+        index_chunk([], job_id=processing_job.id)
+        mock_handle_results.assert_not_called()
+
+        index_chunk([], job_id=processing_job.id)
+        mock_handle_results.assert_called_once_with([], processing_job.id)
+
+
 @pytest.mark.django_db
 def test_handle_error():
     processing_job = ProcessingJob.objects.create(file=None)
@@ -203,8 +693,189 @@ def test_handle_error():
     assert processing_job.error_message == "Test exception"
 
 
+@pytest.fixture
+def mock_es_client():
+    with patch("organizations.indexes.connections.get_connection") as mock_get_connection:
+        client = mock_get_connection.return_value
+        client.indices.get_settings.return_value = {
+            "organizations": {"settings": {"index.number_of_replicas": "1"}}
+        }
+        yield client
+
+
+def test_bulk_load_restores_settings_after_last_job(clear_cache, mock_es_client):
+    start_bulk_load(1)
+    start_bulk_load(2)
+
+    mock_es_client.indices.put_settings.assert_called_once_with(
+        index="organizations", settings={"index.refresh_interval": "-1"}
+    )
+
+    end_bulk_load(1, refresh=True)
+    end_bulk_load(1)
+
+    assert mock_es_client.indices.put_settings.call_count == 1
+    mock_es_client.indices.refresh.assert_called_once_with(index="organizations")
+
+    end_bulk_load(2)
+
+    mock_es_client.indices.put_settings.assert_called_with(
+        index="organizations",
+        settings={"index.refresh_interval": None, "index.number_of_replicas": "1"},
+    )
+
+
+def test_bulk_load_started_twice_for_the_same_job(clear_cache, mock_es_client):
+    start_bulk_load(7)
+    start_bulk_load(7)
+    end_bulk_load(7, refresh=True)
+
+    assert cache.get(BULK_LOAD_JOBS_KEY) is None
+    mock_es_client.indices.put_settings.assert_called_with(
+        index="organizations",
+        settings={"index.refresh_interval": None, "index.number_of_replicas": "1"},
+    )
+
+
+def test_bulk_load_started_while_the_last_one_ends(clear_cache, mock_es_client):
+    index_settings = {"index.number_of_replicas": "1"}
+    mock_es_client.indices.get_settings.side_effect = lambda **kwargs: {
+        "organizations": {"settings": dict(index_settings)}
+    }
+    started = []
+
+    def put_settings(index, settings):
+        index_settings.update(settings)
+        # Another job starts while the last one restores the settings
+        if settings.get("index.refresh_interval") is None and not started:
+            started.append(threading.Thread(target=start_bulk_load, args=(2,)))
+            started[0].start()
+            time.sleep(0.1)
+
+    mock_es_client.indices.put_settings.side_effect = put_settings
+
+    start_bulk_load(1)
+    end_bulk_load(1)
+    started[0].join()
+
+    assert cache.get(BULK_LOAD_JOBS_KEY) == 1
+    assert index_settings["index.refresh_interval"] == "-1"
+
+    end_bulk_load(2)
+
+    assert index_settings["index.refresh_interval"] is None
+    assert cache.get(BULK_LOAD_JOBS_KEY) is None
+
+
+def test_bulk_load_restores_the_settings_of_each_index(clear_cache, mock_es_client):
+    mock_es_client.indices.get_settings.return_value = {
+        "organizations_1": {"settings": {"index.number_of_replicas": "1"}},
+        "organizations_2": {"settings": {"index.refresh_interval": "5s"}},
+    }
+
+    start_bulk_load(1)
+    end_bulk_load(1)
+
+    assert mock_es_client.indices.put_settings.call_args_list[1:] == [
+        call(
+            index="organizations_1",
+            settings={"index.refresh_interval": None, "index.number_of_replicas": "1"},
+        ),
+        call(
+            index="organizations_2",
+            settings={"index.refresh_interval": "5s", "index.number_of_replicas": None},
+        ),
+    ]
+
+
+def test_swap_aliases_replaces_legacy_index(mock_es_client):
+    mock_es_client.indices.exists_alias.return_value = False
+    mock_es_client.indices.exists.return_value = True
+
+    old_indices = swap_aliases("organizations_v1")
+
+    assert old_indices == ["organizations"]
+    mock_es_client.indices.update_aliases.assert_called_once_with(
+        actions=[
+            {"remove_index": {"index": "organizations"}},
+            {"add": {"index": "organizations_v1", "alias": "organizations"}},
+            {"add": {"index": "organizations_v1", "alias": "organizations_write"}},
+        ]
+    )
+    mock_es_client.indices.delete.assert_not_called()
+
+
+def test_swap_aliases_moves_aliases_between_versions(mock_es_client):
+    mock_es_client.indices.exists_alias.return_value = True
+    mock_es_client.indices.get_alias.side_effect = lambda name: (
+        {"organizations_v1": {}}
+        if name == "organizations"
+        else {"organizations_v1": {}, "organizations_v2": {}}
+    )
+
+    swap_aliases("organizations_v2")
+
+    mock_es_client.indices.update_aliases.assert_called_once_with(
+        actions=[
+            {"remove": {"index": "organizations_v1", "alias": "organizations"}},
+            {"remove": {"index": "organizations_v1", "alias": "organizations_write"}},
+            {"add": {"index": "organizations_v2", "alias": "organizations"}},
+            {"add": {"index": "organizations_v2", "alias": "organizations_write"}},
+        ]
+    )
+    mock_es_client.indices.delete.assert_called_once_with(index="organizations_v1")
+
+
+@pytest.mark.django_db
+def test_get_id_ranges():
+    country = Country.objects.create(name="USA")
+    industry = Industry.objects.create(type="Technology")
+    organizations = Organization.objects.bulk_create(
+        Organization(
+            organization_id=f"org{i}", name="Org", country=country, founded=2000, industry=industry
+        )
+        for i in range(5)
+    )
+    first, last = organizations[0].id, organizations[-1].id
+
+    assert get_id_ranges(2) == [(first, first + 2), (first + 3, last)]
+
+
+@pytest.mark.django_db
+def test_populate_index(mock_es_client):
+    country = Country.objects.create(name="USA")
+    industry = Industry.objects.create(type="Technology")
+    Organization.objects.bulk_create(
+        Organization(
+            organization_id=f"org{i}", name="Org", country=country, founded=2000, industry=industry
+        )
+        for i in range(3)
+    )
+    progress = MagicMock()
+
+    with patch("organizations.indexes.streaming_bulk") as mock_streaming_bulk:
+        mock_streaming_bulk.side_effect = lambda client, actions, **kwargs: (
+            (True, action) for action in actions
+        )
+
+        assert populate_index(["organizations_v2"], progress=progress) == (3, 0)
+
+    progress.assert_called_with(3, 0)
+    mock_es_client.indices.refresh.assert_called_once_with(index="organizations_v2")
+
+
 @pytest.mark.django_db
-def test_chunk_processor_process_chunk():
+def test_handle_error_ends_bulk_load():
+    processing_job = ProcessingJob.objects.create(file=None, bulk_load=True)
+
+    with patch("organizations.tasks.end_bulk_load") as mock_end_bulk_load:
+        handle_error(MagicMock(id="task_id"), Exception("Test exception"), None, processing_job.id)
+
+    mock_end_bulk_load.assert_called_once_with(processing_job.id)
+
+
+@pytest.mark.django_db
+def test_chunk_processor_process_chunk(clear_cache):
     chunk = [
         "Index,Organization Id,Name,Website,Country,Description,Founded,Industry,Number of employees",
         "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,Manufacturing,1000",
@@ -221,28 +892,157 @@ def test_chunk_processor_process_chunk():
 
 
 @pytest.mark.django_db
-def test_chunk_processor_get_or_create():
-    with patch("organizations.tasks.CacheManager.get_or_create") as mock_get_or_create:
-        mock_country = Country(name="United States")
-        mock_get_or_create.return_value = mock_country
+def test_chunk_processor_copy_engine(clear_cache):
+    chunk = [
+        "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,Software,1000",
+        "2,def456,Globex,https://globex.com,Chile,Another company,1990,Software,",
+    ]
 
-        country = ChunkProcessor.get_or_create_country("United States")
+    organizations = ChunkProcessor.save_organizations(chunk, ProcessingJob.Engine.COPY)
 
-        assert country == mock_country
-        mock_get_or_create.assert_called_once_with(
-            Country, "country_United States", name="United States"
-        )
+    globex = Organization.objects.get(organization_id="def456")
+    assert organizations[1].id == globex.id
+    assert globex.country.name == "Chile"
+    assert globex.number_of_employees is None
 
-    with patch("organizations.tasks.CacheManager.get_or_create") as mock_get_or_create:
-        mock_industry = Industry(type="Manufacturing")
-        mock_get_or_create.return_value = mock_industry
+    chunk[0] = chunk[0].replace("Acme Inc.", "Acme Corp.")
+    updated = ChunkProcessor.save_organizations(chunk, ProcessingJob.Engine.COPY)
 
-        industry = ChunkProcessor.get_or_create_industry("Manufacturing")
+    assert [org.id for org in updated] == [org.id for org in organizations]
+    assert Organization.objects.get(organization_id="abc123").name == "Acme Corp."
 
-        assert industry == mock_industry
-        mock_get_or_create.assert_called_once_with(
-            Industry, "industry_Manufacturing", type="Manufacturing"
-        )
+
+@pytest.mark.django_db
+def test_chunk_processor_skips_unchanged_rows(clear_cache):
+    row = "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,Software,1000"
+
+    with (
+        patch("organizations.tasks.bulk") as mock_bulk,
+        patch("organizations.tasks.get_write_indices") as mock_get_write_indices,
+    ):
+        mock_bulk.return_value = (1, [])
+        mock_get_write_indices.return_value = ["organizations"]
+        ids = ChunkProcessor.process_chunk([row], engine=ProcessingJob.Engine.COPY)
+        index_chunk(ids)
+
+    assert ChunkProcessor.save_organizations([row]) == []
+    # The hash is only stored once indexed, changed rows are saved until they are
+    changed_row = row.replace("Acme Inc.", "Acme Corp.")
+    for _ in range(2):
+        organizations = ChunkProcessor.save_organizations([changed_row])
+        assert [org.name for org in organizations] == ["Acme Corp."]
+
+
+@pytest.mark.django_db
+def test_chunk_processor_process_chunk_indexes_parsed_rows(clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    JobTracker.start(processing_job.id)
+    JobTracker.add(processing_job.id, 1)
+    JobTracker.done(processing_job.id)
+    chunk = [
+        "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,Software,1000",
+    ]
+
+    with (
+        patch("organizations.tasks.bulk") as mock_bulk,
+        patch("organizations.tasks.get_write_indices") as mock_get_write_indices,
+        patch("organizations.tasks.handle_results.delay") as mock_handle_results,
+    ):
+        mock_bulk.return_value = (1, [])
+        mock_get_write_indices.return_value = ["organizations_v1", "organizations_v2"]
+
+        result = ChunkProcessor.process_chunk(chunk, job_id=processing_job.id, index=True)
+
+    (_, actions), _ = mock_bulk.call_args
+    actions = list(actions)
+    assert [action["_index"] for action in actions] == ["organizations_v1", "organizations_v2"]
+    assert result == [Organization.objects.get(organization_id="abc123").id]
+    assert actions[0]["_source"]["country"] == "United States"
+    assert actions[0]["_source"]["industry"] == "Software"
+    assert actions[0]["_source"]["founded"] == 1900
+    mock_handle_results.assert_called_once_with([], processing_job.id)
+
+
+@pytest.mark.django_db
+def test_job_progress(api_client, clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    JobProgress.start(processing_job.id, total_bytes=1000)
+    JobTracker.start(processing_job.id)
+    JobProgress.add(processing_job.id, chunks_dispatched=2)
+    row = "1,abc123,Acme Inc.,https://acme.com,United States,A fictional company,1900,Software,1000"
+    chunk = [row, "2,not,enough,columns"]
+
+    ChunkProcessor.process_chunk(chunk, job_id=processing_job.id)
+    url = reverse("processing-job-status", kwargs={"job_id": processing_job.id})
+    response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["status"] == ProcessingJob.Status.PENDING
+    assert response.data["progress"] == {
+        "chunks_dispatched": 2,
+        "chunks_parsed": 1,
+        "chunks_indexed": 0,
+        "rows_accepted": 1,
+        "rows_rejected": 1,
+        "rows_unchanged": 0,
+        "bytes_read": len(row) + 20,
+    }
+    assert response.data["rows_per_second"] > 0
+    # Nothing is written to Postgres while the job runs
+    processing_job.refresh_from_db()
+    assert processing_job.progress == {}
+
+    with patch("organizations.tasks.handle_results.delay") as mock_handle_results:
+        complete_chunk(processing_job.id)
+    mock_handle_results.assert_called_once()
+    handle_results([], processing_job.id)
+
+    processing_job.refresh_from_db()
+    assert processing_job.progress["chunks_indexed"] == 1
+    assert processing_job.finished_at is not None
+    assert JobProgress.get(processing_job.id) is None
+    response = api_client.get(url)
+    assert response.data["percent"] == 100.0
+    assert response.data["progress"]["rows_accepted"] == 1
+
+
+@pytest.mark.django_db
+def test_processing_job_status_before_processing(api_client, clear_cache):
+    processing_job = ProcessingJob.objects.create(file=None)
+    url = reverse("processing-job-status", kwargs={"job_id": processing_job.id})
+
+    response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["status"] == ProcessingJob.Status.PENDING
+    assert response.data["started_at"] is None
+    assert response.data["total_bytes"] == 0
+    assert set(response.data["progress"].values()) == {0}
+
+
+def test_processing_job_status_not_found(api_client, db):
+    url = reverse("processing-job-status", kwargs={"job_id": 999})
+
+    assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_chunk_processor_get_organizations_from_rows():
+    rows = [
+        ["1", "abc123", "Acme Inc.", "", "United States", "", "1900", "Software", "10"],
+        ["2", "def456", "Globex", "", "United States", "", "1990", "Software", ""],
+    ]
+    with patch("organizations.tasks.CacheManager.get_many_ids") as mock_get_many_ids:
+        mock_get_many_ids.side_effect = lambda model, field, values: dict.fromkeys(values, 1)
+
+        organizations = ChunkProcessor.get_organizations_from_rows(rows)
+
+    mock_get_many_ids.assert_any_call(Country, "name", {"United States"})
+    mock_get_many_ids.assert_any_call(Industry, "type", {"Software"})
+    # Rows share one instance per country and industry
+    assert organizations[0].country is organizations[1].country
+    assert organizations[0].industry.id == 1
+    assert organizations[1].number_of_employees is None
 
 
 def test_file_processor_get_chunks():
@@ -255,22 +1055,298 @@ def test_file_processor_get_chunks():
     assert len(chunks) == 3
 
 
-def test_cache_manager_get_or_create():
+@pytest.mark.parametrize(
+    "compression, compress",
+    [
+        ("gzip", gzip.compress),
+        ("bz2", bz2.compress),
+        ("zstd", zstandard.ZstdCompressor().compress),
+    ],
+)
+def test_file_processor_get_chunks_compressed(compression, compress):
+    csv_content = b"header1,header2\nvalue1,value2\nvalue3,value4"
+    file = ContentFile(compress(csv_content), name="test.csv")
+
+    file_processor = FileProcessor(file, chunk_size=2)
+    chunks = list(file_processor.get_chunks())
+
+    assert file_processor.compression == compression
+    assert chunks == [["header1,header2\n", "value1,value2\n"], ["value3,value4"]]
+    assert file_processor.bytes_read == len(csv_content)
+
+
+def get_parquet_content(rows, row_group_size=None):
+    columns = [
+        "Organization Id",
+        "Name",
+        "Website",
+        "Country",
+        "Description",
+        "Founded",
+        "Industry",
+        "Number of employees",
+    ]
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.table({column: [row[i] for row in rows] for i, column in enumerate(columns)}),
+        buffer,
+        row_group_size=row_group_size,
+    )
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+def test_chunk_processor_parse_table(clear_cache):
+    table = pa.table(
+        {
+            "organization_id": ["abc123", "def456", "ghi789", "jkl012", ""],
+            "name": ["Acme Inc.", "Globex", "Initech", "Umbrella", "Nameless"],
+            "website": ["https://acme.com", None, "", "https://umbrella.com", None],
+            "country": ["United States", "Spain", "United States", "Spain", "Spain"],
+            "description": ["A company", None, None, None, None],
+            "founded": [" 1900", "1990", "not a year", "2000", "2001"],
+            "industry": ["Software", "Software", "Software", "Biotech", "Software"],
+            "number_of_employees": [1000.0, None, 10.0, 2.5, 1.0],
+        }
+    )
+
+    parsed, rejected = ChunkProcessor.parse_table(table)
+
+    # Bad founding years, fractional employee counts and blank ids are rejected
+    assert rejected == 3
+    assert parsed["organization_id"].to_pylist() == ["abc123", "def456"]
+    assert parsed["founded"].to_pylist() == [1900, 1990]
+    assert parsed["number_of_employees"].to_pylist() == [1000, None]
+    assert parsed["country_id"].to_pylist() == [
+        Country.objects.get(name="United States").id,
+        Country.objects.get(name="Spain").id,
+    ]
+
+
+@pytest.mark.django_db
+def test_save_table_rejects_integers_out_of_range(clear_cache):
+    table = pa.table(
+        {
+            "organization_id": ["abc123", "def456", "ghi789", "jkl012"],
+            "name": ["Acme Inc.", "Globex", "Initech", "Umbrella"],
+            "website": [None, None, None, None],
+            "country": ["Spain", "Spain", "Spain", "Spain"],
+            "description": [None, None, None, None],
+            "founded": ["1900", "3000000000", "1990", "2000"],
+            "industry": ["Software", "Software", "Software", "Software"],
+            "number_of_employees": [3_000_000_000, 10, -3_000_000_000, 2**31 - 1],
+        }
+    )
+    processing_job = ProcessingJob.objects.create(file=None)
+    JobProgress.start(processing_job.id, total_bytes=0)
+
+    saved = ChunkProcessor.save_table(table, processing_job.id, 0)
+
+    assert saved["organization_id"].to_pylist() == ["jkl012"]
+    assert Organization.objects.get().number_of_employees == 2**31 - 1
+    assert JobProgress.get(processing_job.id)["rows_rejected"] == 3
+
+
+@pytest.mark.django_db
+def test_save_table_rejects_strings_too_long(clear_cache):
+    table = pa.table(
+        {
+            "organization_id": ["a" * 31, "def456", "ghi789", "jkl012", "mno345", "a" * 30],
+            "name": ["Acme Inc.", "G" * 256, "Initech", "Umbrella", "Hooli", "ü" * 255],
+            "website": [None, None, "https://" + "a" * 200, None, None, None],
+            "country": ["Spain", "Spain", "Spain", "S" * 256, "Spain", "Spain"],
+            "description": ["D" * 10_000, None, None, None, None, "D" * 10_000],
+            "founded": [1900, 1900, 1900, 1900, 1900, 1900],
+            "industry": ["Software", "Software", "Software", "Software", "I" * 256, "Software"],
+            "number_of_employees": [None, None, None, None, None, None],
+        }
+    )
+    processing_job = ProcessingJob.objects.create(file=None)
+    JobProgress.start(processing_job.id, total_bytes=0)
+
+    saved = ChunkProcessor.save_table(table, processing_job.id, 0)
+
+    # Lengths are counted in characters, like varchar
+    assert saved["organization_id"].to_pylist() == ["a" * 30]
+    assert Organization.objects.get().name == "ü" * 255
+    assert JobProgress.get(processing_job.id)["rows_rejected"] == 5
+
+
+@pytest.mark.django_db
+def test_process_parquet_record_batches(clear_cache):
+    rows = [
+        ("abc123", "Acme Inc.", "https://acme.com", "United States", "", 1900, "Software", 10),
+        ("def456", "Globex", None, "Spain", None, 1990, "Software", None),
+        ("ghi789", "Initech", None, "Spain", None, 2000, "Biotech", 50),
+    ]
+    file = SimpleUploadedFile("test.parquet", get_parquet_content(rows, row_group_size=2))
+    processing_job = ProcessingJob.objects.create(file=file)
+
+    with patch("organizations.tasks.group") as mock_group:
+        process_csv(processing_job.id)
+    chains = mock_group.call_args.args
+    # Batches never span row groups
+    batches = [chain.tasks[0].args[0] for chain in chains]
+    assert [chain.tasks[0].kwargs["chunk_index"] for chain in chains] == [0, 1]
+    assert [FileProcessor.decode_record_batch(batch).num_rows for batch in batches] == [2, 1]
+
     with (
-        patch("organizations.tasks.cache.get") as mock_get,
-        patch("organizations.tasks.cache.set") as mock_set,
-        patch("organizations.models.Country.objects.get_or_create") as mock_get_or_create,
+        patch("organizations.tasks.bulk") as mock_bulk,
+        patch("organizations.tasks.get_write_indices") as mock_get_write_indices,
     ):
-        mock_get.return_value = None
-        mock_country = Country(name="United States")
-        mock_get_or_create.return_value = (mock_country, True)
+        mock_bulk.return_value = (2, [])
+        mock_get_write_indices.return_value = ["organizations"]
+        ids = ChunkProcessor.process_record_batch(batches[0], index=True)
+
+    assert len(ids) == 2
+    assert Organization.objects.get(organization_id="def456").industry.type == "Software"
+    # The same rows were indexed, loading them again writes nothing
+    assert ChunkProcessor.process_record_batch(batches[0]) == []
+    assert len(ChunkProcessor.process_record_batch(batches[1])) == 1
 
-        country = CacheManager.get_or_create(Country, "country_United States", name="United States")
 
-        assert country == mock_country
-        mock_get.assert_called_once_with("country_United States")
-        mock_set.assert_called_once_with("country_United States", mock_country, timeout=3600)
-        mock_get_or_create.assert_called_once_with(name="United States")
+@pytest.mark.django_db
+def test_file_processor_cuts_record_batches_to_fit_a_message():
+    rows = [
+        (f"org{i}", f"Organization {i}", None, "Spain", str(i**7), 1900, "Software", i)
+        for i in range(200)
+    ]
+    file = SimpleUploadedFile("test.parquet", get_parquet_content(rows))
+    processing_job = ProcessingJob.objects.create(file=file)
+
+    with patch("organizations.tasks.PARQUET_MAX_MESSAGE_BYTES", 4000):
+        batches = list(FileProcessor(processing_job.file).get_record_batches())
+
+    assert len(batches) > 1
+    assert all(len(batch) <= 4000 for batch, _ in batches)
+    tables = [FileProcessor.decode_record_batch(batch) for batch, _ in batches]
+    assert [pk for table in tables for pk in table["organization_id"].to_pylist()] == [
+        row[0] for row in rows
+    ]
+
+
+def test_file_processor_sniffs_minio_files_with_a_ranged_read():
+    file = MagicMock(storage=MagicMock(spec=MinioStorage), size=1000)
+    file.name = "uploads/test.parquet"
+    file.storage.client = MagicMock()
+    file.storage.bucket_name = "media"
+    get_object = file.storage.client.get_object
+    get_object.return_value.read.return_value = b"PAR1"
+
+    file_processor = FileProcessor(file)
+
+    assert file_processor.is_parquet
+    assert file_processor.compression is None
+    get_object.assert_called_with("media", file.name, offset=0, length=4)
+    file.read.assert_not_called()
+
+
+def test_file_processor_get_byte_ranges():
+    csv_content = b"header1,header2\nvalue1,value2\nvalue3,value4"
+    file = ContentFile(csv_content, name="test.csv")
+
+    file_processor = FileProcessor(file, chunk_size=2)
+    ranges = list(file_processor.get_byte_ranges())
+
+    assert ranges == [(0, 30), (30, 43)]
+
+
+def test_file_processor_get_chunk_from_range():
+    csv_content = b"header1,header2\nvalue1,value2\nvalue3,value4"
+    file = ContentFile(csv_content, name="test.csv")
+
+    chunk = FileProcessor.get_chunk_from_range(file, 16, 43)
+
+    assert chunk == ["value1,value2\n", "value3,value4"]
+
+
+@pytest.mark.django_db
+def test_cache_manager_get_many_ids(clear_cache):
+    existing = Country.objects.create(name="Chile")
+
+    ids = CacheManager.get_many_ids(Country, "name", {"Chile", "Peru"})
+
+    assert ids == {"Chile": existing.id, "Peru": Country.objects.get(name="Peru").id}
+
+    with patch("organizations.models.Country.objects.bulk_create") as mock_bulk_create:
+        assert CacheManager.get_many_ids(Country, "name", {"Chile", "Peru"}) == ids
+        mock_bulk_create.assert_not_called()
+    # Only primary keys are cached, never model instances
+    generation = CacheManager.get_generation()
+    assert cache.get(f"country_id_{generation}_Peru") == ids["Peru"]
+
+
+@pytest.mark.django_db
+def test_cache_manager_two_tier_lookup(clear_cache):
+    country = Country.objects.create(name="Chile")
+    CacheManager.get_many_ids(Country, "name", {"Chile"})
+
+    with patch("organizations.tasks.cache.get_many") as mock_get_many:
+        assert CacheManager.get_many_ids(Country, "name", {"Chile"}) == {"Chile": country.id}
+        mock_get_many.assert_not_called()
+
+    country.delete()
+    assert CacheManager.local_cache.get(f"country_id_{CacheManager.generation}_Chile") is None
+
+    ids = CacheManager.get_many_ids(Country, "name", {"Chile"})
+
+    assert ids["Chile"] != country.id
+    assert CacheManager.get_stats()["local_hits"] >= 1
+
+
+def test_single_flight_shares_result_between_threads(clear_cache):
+    flight = SingleFlight(timeout=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"results": [1]}
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flight.do, "search_key", compute)
+        started.wait(timeout=5)
+        followers = [executor.submit(flight.do, "search_key", compute) for _ in range(4)]
+        release.set()
+        results = [leader.result(), *(future.result() for future in followers)]
+
+    assert len(calls) == 1
+    assert results == [{"results": [1]}] * 5
+    assert cache.get("search_key") == {"results": [1]}
+    assert cache.get("search_key_lock") is None
+
+
+def test_single_flight_waits_for_other_processes(clear_cache):
+    flight = SingleFlight(timeout=60, poll_interval=0.01)
+    compute = MagicMock(return_value="computed")
+    # Another pod holds the lock and stores its result a bit later
+    cache.add("search_key_lock", 1, timeout=5)
+    threading.Timer(0.05, cache.set, args=("search_key", "shared")).start()
+
+    assert flight.do("search_key", compute) == "shared"
+    compute.assert_not_called()
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert lru.get("c") == 3
+
+
+def test_lru_cache_timeout():
+    lru = LRUCache(timeout=-1)
+    lru.set("a", 1)
+
+    assert lru.get("a") is None
 
 
 @pytest.fixture
@@ -373,3 +1449,106 @@ def test_paginate_queryset_invalid_page_size(pagination, mock_queryset, request_
 
     assert len(result) == 10  # default page_size
     assert pagination.page_size == 10  # default page_size
+
+
+def test_paginate_queryset_opens_pit(pagination, mock_queryset, request_factory):
+    request = request_factory.get("/?pit=true")
+    request.query_params = QueryDict("pit=true")
+
+    mock_queryset.index.return_value = mock_queryset
+    mock_queryset.extra.return_value = mock_queryset
+    mock_queryset.__iter__.return_value = [create_mock_hit(i, [i, i]) for i in range(11)]
+    mock_queryset.execute.return_value.pit_id = "pit-2"
+
+    with patch("organizations.paginators.connections.get_connection") as mock_get_connection:
+        mock_get_connection.return_value.open_point_in_time.return_value = {"id": "pit-1"}
+        result = pagination.paginate_queryset(mock_queryset, request)
+
+    assert len(result) == 10
+    mock_queryset.extra.assert_called_once_with(pit={"id": "pit-1", "keep_alive": "1m"})
+    # The next page continues after the last returned item, with the latest PIT id
+    assert pagination.get_next_cursor() == {"pit_id": "pit-2", "search_after": [9, 9]}
+
+
+def test_paginate_queryset_pit_cursor(pagination, mock_queryset, request_factory):
+    cursor = pagination.encode_cursor({"pit_id": "pit-1", "search_after": [1.0, 7]})
+    request = request_factory.get("/", {"cursor": cursor})
+    request.query_params = QueryDict(f"cursor={cursor}")
+
+    mock_queryset.index.return_value = mock_queryset
+    mock_queryset.extra.return_value = mock_queryset
+    mock_queryset.__iter__.return_value = [create_mock_hit(i, [i, i]) for i in range(3)]
+    mock_queryset.execute.return_value.pit_id = "pit-1"
+
+    with patch("organizations.paginators.connections.get_connection") as mock_get_connection:
+        pagination.paginate_queryset(mock_queryset, request)
+
+    mock_queryset.extra.assert_any_call(pit={"id": "pit-1", "keep_alive": "1m"})
+    mock_queryset.extra.assert_any_call(search_after=[1.0, 7])
+    mock_get_connection.return_value.open_point_in_time.assert_not_called()
+    # Last page, the PIT is released
+    mock_get_connection.return_value.close_point_in_time.assert_called_once_with(id="pit-1")
+
+
+@pytest.fixture
+def mock_async_client():
+    client = MagicMock()
+    client.search = AsyncMock()
+    client.get = AsyncMock()
+    client.close = AsyncMock()
+    with patch("organizations.async_views.AsyncElasticsearch", return_value=client):
+        yield client
+
+
+def test_search_organization_async_view(api_client, mock_async_client, clear_cache):
+    hits = [
+        {"_id": f"org{i}", "_source": create_search_hit(f"org{i}").to_dict(), "sort": [1.0, i]}
+        for i in range(3)
+    ]
+    mock_async_client.search.return_value = MagicMock(body={"hits": {"hits": hits}})
+    url = reverse("organization-search-async")
+
+    response = api_client.get(url, {"q": "test", "page_size": 2})
+    cached_response = api_client.get(url, {"q": "test", "page_size": 2})
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [org["organization_id"] for org in data["results"]] == ["org0", "org1"]
+    assert "cursor=" in data["next"]
+    assert cached_response["X-Cache"] == "HIT"
+    mock_async_client.search.assert_awaited_once()
+    assert mock_async_client.search.call_args.kwargs["body"]["size"] == 3
+
+
+def test_get_organization_async_view(api_client, mock_async_client):
+    mock_async_client.get.return_value = {"_source": create_search_hit("org123").to_dict()}
+
+    response = api_client.get(
+        reverse("organization-get-async", kwargs={"organization_id": "org123"})
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["organization_id"] == "org123"
+    mock_async_client.get.assert_awaited_once_with(index="organizations", id="org123")
+
+
+def test_async_client_lifetime(api_client, mock_async_client):
+    mock_async_client.get.return_value = {"_source": create_search_hit("org123").to_dict()}
+    url = reverse("organization-get-async", kwargs={"organization_id": "org123"})
+
+    # Under WSGI every request runs in a new event loop, its client is closed with it
+    with patch("organizations.async_views.AsyncElasticsearch") as mock_client_class:
+        mock_client_class.return_value = mock_async_client
+        for _ in range(2):
+            assert api_client.get(url).status_code == status.HTTP_200_OK
+        assert mock_client_class.call_count == 2
+        assert mock_async_client.close.await_count == 2
+
+        # Under ASGI the requests of an event loop share its client
+        async def get_twice():
+            client = AsyncClient()
+            return [(await client.get(url)).status_code for _ in range(2)]
+
+        assert async_to_sync(get_twice)() == [status.HTTP_200_OK] * 2
+        assert mock_client_class.call_count == 3
+        assert mock_async_client.close.await_count == 2
@@ -1,22 +1,39 @@
 from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from elasticsearch.exceptions import NotFoundError as ElasticsearchNotFoundError
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
+from organizations.caches import DocumentCache
+from organizations.models import ProcessingJob
 from organizations.paginators import ElasticsearchCursorPagination
+from organizations.renderers import ORJSONRenderer
 from organizations.serializers import (
+    AutocompleteRequestQueryParamsSerializer,
     FileUploadResponseSerializer,
     FileUploadSerializer,
+    OrganizationBatchRequestSerializer,
+    OrganizationBatchResponseSerializer,
     OrganizationCreateSerializer,
+    OrganizationFacetsRequestQueryParamsSerializer,
+    OrganizationFacetsResponseSerializer,
     OrganizationListRequestQueryParamsSerializer,
+    OrganizationSuggestionSerializer,
+    ProcessingJobStatusSerializer,
 )
 from organizations.services import (
+    SearchCache,
+    autocomplete_organizations,
     build_organization_search_query,
     create_organization,
     create_processing_job,
-    get_organization,
+    get_organization_data,
+    get_organization_facets,
+    get_organizations,
+    get_processing_job_status,
+    serialize_search_page,
 )
 
 
@@ -44,7 +61,27 @@ def create_organization_view(request):
     request={
         "multipart/form-data": {
             "type": "object",
-            "properties": {"file": {"type": "string", "format": "binary"}},
+            "properties": {
+                "file": {
+                    "type": "string",
+                    "format": "binary",
+                    "description": "CSV file, optionally compressed with gzip, bzip2 or zstd, "
+                    "or Parquet file.",
+                },
+                "engine": {
+                    "type": "string",
+                    "enum": ProcessingJob.Engine.values,
+                    "default": ProcessingJob.Engine.ORM,
+                    "description": "ORM upserts each chunk with bulk_create, COPY streams it "
+                    "through a staging table with COPY FROM STDIN.",
+                },
+                "bulk_load": {
+                    "type": "boolean",
+                    "default": False,
+                    "description": "Pause index refreshes while the file is indexed and "
+                    "refresh once when the job finishes.",
+                },
+            },
         }
     },
     responses={
@@ -60,12 +97,40 @@ def create_organization_view(request):
 def upload_csv_view(request):
     serializer = FileUploadSerializer(data=request.data)
     if serializer.is_valid():
-        result = create_processing_job(serializer.validated_data["file"])
+        result = create_processing_job(**serializer.validated_data)
         response_serializer = FileUploadResponseSerializer(result)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="job_id",
+            description="Processing job ID",
+            type=int,
+            location=OpenApiParameter.PATH,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=ProcessingJobStatusSerializer,
+            description="Processing job status, progress, throughput and ETA",
+        ),
+        404: OpenApiResponse(description="Processing job not found"),
+    },
+    description="Follow the progress of a CSV processing job.",
+)
+@api_view(["GET"])
+def processing_job_status_view(request, job_id):
+    try:
+        processing_job = ProcessingJob.objects.get(id=job_id)
+    except ProcessingJob.DoesNotExist:
+        return Response({"detail": "Processing job not found"}, status=status.HTTP_404_NOT_FOUND)
+    serializer = ProcessingJobStatusSerializer(get_processing_job_status(processing_job))
+    return Response(serializer.data)
+
+
 @extend_schema(
     parameters=[
         OpenApiParameter(name="q", description="Search query", type=str, required=False),
@@ -102,6 +167,27 @@ def upload_csv_view(request):
             type={"type": "string", "minimum": 1, "maximum": 100},
             required=False,
         ),
+        OpenApiParameter(
+            name="fields",
+            description="Comma separated organization fields to return, e.g. "
+            "name,country,industry. All fields are returned by default.",
+            type=str,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="pit",
+            description="Paginate over a point-in-time snapshot of the index, so pages stay "
+            "consistent while the index changes. The cursor keeps the snapshot alive.",
+            type=bool,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="Cache-Control",
+            description="Send no-cache to skip the search result cache",
+            type=str,
+            location=OpenApiParameter.HEADER,
+            required=False,
+        ),
     ],
     responses={
         200: OpenApiResponse(
@@ -114,6 +200,7 @@ def upload_csv_view(request):
     description="List and search organizations with optional filters and pagination.",
 )
 @api_view(["GET"])
+@renderer_classes([ORJSONRenderer, BrowsableAPIRenderer])
 def search_organization_view(request):
     try:
         # Validate and build the search query
@@ -121,18 +208,151 @@ def search_organization_view(request):
             raise_exception=True
         )
 
-        search_query = build_organization_search_query(request.query_params)
-        paginator = ElasticsearchCursorPagination()
+        def search():
+            search_query = build_organization_search_query(request.query_params)
+            paginator = ElasticsearchCursorPagination()
+
+            page = paginator.paginate_queryset(search_query, request)
+
+            results = serialize_search_page(page, request.query_params)
+            return paginator.get_paginated_response(results).data
+
+        base_url = request.build_absolute_uri().split("?")[0]
+        cache_key = SearchCache.get_key(base_url, request.query_params)
+        if SearchCache.is_bypassed(request):
+            data = search()
+            if not SearchCache.is_private(request):
+                SearchCache.set(cache_key, data)
+        else:
+            data = SearchCache.get(cache_key)
+            if data is not None:
+                return Response(data, headers={"X-Cache": "HIT"})
+            data = SearchCache.get_or_compute(cache_key, search)
+
+        return Response(data, headers={"X-Cache": "MISS"})
+
+    except ElasticsearchNotFoundError as e:
+        return Response({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(name="q", description="Search query", type=str, required=False),
+        OpenApiParameter(
+            name="country",
+            description="Filter by exact country name (case sensitive)",
+            type=str,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="industry",
+            description="Filter by exact industry type (case sensitive)",
+            type=str,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="founded_min",
+            description="Filter by minimum founding year",
+            type=int,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="founded_max",
+            description="Filter by maximum founding year",
+            type=int,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="founded_interval",
+            description="Width in years of the founding year buckets (default 10)",
+            type=int,
+            required=False,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=OrganizationFacetsResponseSerializer,
+            description="Organization counts per country, industry and founding year range",
+        ),
+        400: OpenApiResponse(description="Bad request. Validation errors in the query parameters."),
+        404: OpenApiResponse(description="Index not found"),
+    },
+    description="Facet counts of the organizations matching the search filters.",
+)
+@api_view(["GET"])
+def organization_facets_view(request):
+    try:
+        OrganizationFacetsRequestQueryParamsSerializer(data=request.query_params).is_valid(
+            raise_exception=True
+        )
+
+        # Unfiltered facets are what every filter sidebar loads first, so only those are cached
+        if any(request.query_params.values()) or SearchCache.is_bypassed(request):
+            return Response(get_organization_facets(request.query_params))
+
+        base_url = request.build_absolute_uri().split("?")[0]
+        cache_key = SearchCache.get_key(base_url, request.query_params)
+        data = SearchCache.get(cache_key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+        data = SearchCache.get_or_compute(
+            cache_key, lambda: get_organization_facets(request.query_params)
+        )
+        return Response(data, headers={"X-Cache": "MISS"})
 
-        page = paginator.paginate_queryset(search_query, request)
+    except ElasticsearchNotFoundError as e:
+        return Response({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = OrganizationCreateSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="q", description="Beginning of the organization name", type=str, required=True
+        ),
+        OpenApiParameter(
+            name="limit",
+            description="Maximum number of suggestions",
+            type={"type": "integer", "minimum": 1, "maximum": 10, "default": 5},
+            required=False,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=OrganizationSuggestionSerializer(many=True),
+            description="Organizations whose name starts with the query",
+        ),
+        400: OpenApiResponse(description="Bad request. Validation errors in the query parameters."),
+        404: OpenApiResponse(description="Index not found"),
+    },
+    description="Suggest organization names as the user types.",
+)
+@api_view(["GET"])
+def autocomplete_organization_view(request):
+    serializer = AutocompleteRequestQueryParamsSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    try:
+        suggestions = autocomplete_organizations(
+            serializer.validated_data["q"], serializer.validated_data["limit"]
+        )
+        return Response(suggestions)
     except ElasticsearchNotFoundError as e:
         return Response({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
 
 
+@extend_schema(
+    responses={
+        200: OpenApiResponse(
+            description="Hits and misses of the search result cache, shared by every process, "
+            "and of the organization document cache of the process serving the request"
+        )
+    },
+    description="Search result and document cache statistics.",
+)
+@api_view(["GET"])
+def cache_stats_view(request):
+    return Response({"search": SearchCache.get_stats(), "documents": DocumentCache.get_stats()})
+
+
 @extend_schema(
     parameters=[
         OpenApiParameter(
@@ -154,8 +374,32 @@ def search_organization_view(request):
 @api_view(["GET"])
 def get_organization_view(request, organization_id):
     try:
-        organization = get_organization(organization_id)
-        serializer = OrganizationCreateSerializer(organization)
-        return Response(serializer.data)
+        return Response(get_organization_data(organization_id))
+    except ElasticsearchNotFoundError as e:
+        return Response({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)
+
+
+@extend_schema(
+    request=OrganizationBatchRequestSerializer,
+    responses={
+        200: OpenApiResponse(
+            response=OrganizationBatchResponseSerializer,
+            description="Organizations found and the ids that don't exist",
+        ),
+        400: OpenApiResponse(description="Bad request. Validation errors in the provided data."),
+        404: OpenApiResponse(description="Index not found"),
+    },
+    description="Retrieve up to 100 organizations by organization_id in a single request.",
+)
+@api_view(["POST"])
+def get_organizations_batch_view(request):
+    serializer = OrganizationBatchRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        found, missing = get_organizations(serializer.validated_data["organization_ids"])
+        response_serializer = OrganizationBatchResponseSerializer(
+            {"found": found, "missing": missing}
+        )
+        return Response(response_serializer.data)
     except ElasticsearchNotFoundError as e:
         return Response({"detail": e.error}, status=status.HTTP_404_NOT_FOUND)